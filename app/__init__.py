@@ -1,9 +1,14 @@
 from flask import Flask
+import importlib
 import os
+import time
 from app.extensions import db, migrate
 from flask_cors import CORS
+from app.utils.metrics import init_metrics
+from app.utils.startupTiming import record, startup_timings, timed
 
 def create_app():
+    started = time.perf_counter()
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50 MB
     app = Flask(__name__)
     app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
@@ -29,22 +34,37 @@ def create_app():
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
+    init_metrics(app)
 
-    # Register blueprints    
-    from app.controllers.users import users_bp
-    from app.controllers.extract import extract_bp
-    from app.controllers.classes import classes_bp
-    from app.controllers.student import student_bp
-    from app.controllers.hcr import hcr_bp
-    from app.controllers.referral import referral_bp
-    from app.controllers.caregiver import caregiver_bp
-
-    app.register_blueprint(users_bp, url_prefix="/api/users")
-    app.register_blueprint(extract_bp, url_prefix="/api/extract")
-    app.register_blueprint(classes_bp, url_prefix="/api/classes")
-    app.register_blueprint(student_bp, url_prefix="/api/students")
-    app.register_blueprint(hcr_bp, url_prefix="/api/hcr")
-    app.register_blueprint(referral_bp, url_prefix="/api/referrals")
-    app.register_blueprint(caregiver_bp, url_prefix="/api/caregivers")
+    # Register blueprints. Controllers only import what listing/CRUD needs;
+    # openai, playwright, bs4, pdf2image and docx load on first use.
+    blueprints = [
+        ("app.controllers.users", "users_bp", "/api/users"),
+        ("app.controllers.extract", "extract_bp", "/api/extract"),
+        ("app.controllers.classes", "classes_bp", "/api/classes"),
+        ("app.controllers.student", "student_bp", "/api/students"),
+        ("app.controllers.hcr", "hcr_bp", "/api/hcr"),
+        ("app.controllers.referral", "referral_bp", "/api/referrals"),
+        ("app.controllers.caregiver", "caregiver_bp", "/api/caregivers"),
+        ("app.controllers.jobs", "jobs_bp", "/api/jobs"),
+        ("app.controllers.search", "search_bp", "/api/search"),
+        ("app.controllers.metrics", "metrics_bp", "/api/metrics"),
+    ]
+    for module_name, attr, url_prefix in blueprints:
+        with timed(f"import.{module_name}"):
+            module = importlib.import_module(module_name)
+        app.register_blueprint(getattr(module, attr), url_prefix=url_prefix)
 
+    # Extraction workers start with the first request so CLI commands
+    # (flask db ...) never spin them up.
+    from app.utils.jobQueue import ensure_workers
+
+    @app.before_request
+    def _start_extraction_workers():
+        ensure_workers(app)
+
+    elapsed = time.perf_counter() - started
+    record("create_app", elapsed)
+    imports = sorted(((k, v) for k, v in startup_timings().items() if k.startswith("import.")), key=lambda x: -x[1])
+    print(f"App started in {elapsed:.3f}s (slowest imports: " + ", ".join(f"{k[7:]}={v:.3f}s" for k, v in imports[:3]) + ")")
     return app
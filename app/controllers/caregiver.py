@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import or_, func
 from app.extensions import db
 from app.models.caregiver import Caregiver
-from app.utils.scrapper import lookup_current_employment
+from app.utils.pagination import wants_page, keyset_page
+from app.utils.hcrCache import cached_lookup, is_force_refresh
 from datetime import datetime
 
 
@@ -86,6 +87,9 @@ def list_caregivers():
     if name:
         query = query.filter(Caregiver.full_name.ilike(f"%{name}%"))
 
+    if wants_page(request.args):
+        return jsonify(keyset_page(query, Caregiver, request.args, lambda caregiver: caregiver.to_dict()))
+
     caregivers = query.order_by(Caregiver.id.asc()).all()
     return jsonify([caregiver.to_dict() for caregiver in caregivers])
 
@@ -122,8 +126,9 @@ def sync_caregiver_hcr(registry_number):
         return jsonify({"error": "Caregiver not found for registry number"}), 404
 
     try:
-        job_info = lookup_current_employment(normalized_registry_number, headless=True)
+        job_info, from_cache = cached_lookup(normalized_registry_number, force=is_force_refresh(request))
     except Exception as exc:
+        db.session.rollback()
         for caregiver in caregivers:
             caregiver.queryStatus = "failed"
         db.session.commit()
@@ -149,6 +154,7 @@ def sync_caregiver_hcr(registry_number):
         "registry_number": normalized_registry_number,
         "work_status": "employed" if job_info else "unemployed",
         "employment_records": job_info,
+        "cached": from_cache,
         "updated": [caregiver.to_dict() for caregiver in caregivers],
     }), 200
 
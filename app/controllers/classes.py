@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app.extensions import db
 from app.models.classes import Classes
+from app.models.student import Student
+from app.utils.injectData import ClassGrading
+from app.utils.pagination import wants_page, keyset_page
 
 classes_bp = Blueprint("classes",__name__)
 
@@ -26,6 +29,9 @@ UPDATABLE_CLASS_FIELDS = {
 
 @classes_bp.route("/", methods=["GET"])
 def list_classes():
+    if wants_page(request.args):
+        return jsonify(keyset_page(Classes.query, Classes, request.args, lambda c: c.to_dict()))
+
     classList = Classes.query.order_by(Classes.id.asc()).all()
     return jsonify([c.to_dict() for c in classList])
 
@@ -36,6 +42,33 @@ def getById(id):
     return jsonify(c.to_dict())
 
 
+@classes_bp.route("/<int:id>/grades", methods=["GET"])
+def class_grades(id):
+    class_obj = Classes.query.get(id)
+    if not class_obj:
+        return jsonify({"error": "Class not found"}), 404
+
+    cna = (request.args.get("cna") or "").lower() in {"1", "true"}
+    grading = ClassGrading(class_obj, cna=cna)
+    students = (
+        Student.query
+        .with_entities(Student.id, Student.firstName, Student.lastName, Student.modules, Student.units)
+        .filter_by(classId=id)
+        .order_by(Student.id.asc())
+        .all()
+    )
+
+    report = []
+    for s in students:
+        try:
+            grades = grading.grade(s.modules, s.units)
+        except KeyError as e:
+            grades = {"error": f"Unknown grade {e}"}
+        report.append({"id": s.id, "firstName": s.firstName, "lastName": s.lastName, **grades})
+
+    return jsonify({"classId": id, "students": report})
+
+
 @classes_bp.route("/<int:id>", methods=["PUT", "PATCH"])
 def update_class(id):
     data = request.get_json() or {}
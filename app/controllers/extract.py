@@ -3,17 +3,30 @@ from app.extensions import db
 from app.models.student import Student
 from app.models.classes import Classes
 from werkzeug.utils import secure_filename
-from openai import OpenAI
+from sqlalchemy import or_
+from concurrent.futures import ThreadPoolExecutor
+import io
 import os
 import json 
+import zipfile
 from app.utils.utilExtract import postprocess_payload, pdf_to_data_url,allowed_file
-from app.utils.ocrPdf import pdf_to_page_images
+from app.utils.ocrPdf import iter_page_images, summarize_encodings
+from app.utils.extractCache import extraction_cache, extraction_key
+from app.utils.blobStore import blob_store, ref_for
+from app.utils.hcrCache import normalize_registry_number
+from app.utils.jobQueue import register_handler, submit_job, is_async_request
+from app.utils.llmClient import get_openai_client
+from app.utils.metrics import span
 
 extract_bp = Blueprint("extract", __name__)
 
 # ----- Config -----
-OPENAI_API_KEY = os.getenv("OPEN_AI_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+EXTRACT_MODEL = "gpt-5-mini"
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "8"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))
+# Decompressed size allowed per zip member and for all members of a request.
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", str(500 * 1024 * 1024)))
 
 SCHEMA_HINT = """
 You are a document data extractor.
@@ -109,33 +122,42 @@ Rules and conversions:
 
 
 def _extract_student_payload(pdf_bytes, schema_hint):
-    data_url = pdf_to_page_images(pdf_bytes, dpi=300, max_pages=20)
+    cache_key = extraction_key(pdf_bytes, schema_hint, EXTRACT_MODEL)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        print(f"Extraction cache hit {cache_key[:12]}")
+        return cached, json.dumps(cached)
+
+    encodings = []
     content_parts = [{"type": "text", "text": schema_hint}]
-    content_parts += [{"type": "image_url", "image_url": {"url": u}} for u in data_url]
-    resp = client.chat.completions.create(
-        model="gpt-5-mini",
-        temperature=1,
-        messages=[
-            {"role": "system", "content": "You extract structured data from documents and output strict JSON."},
-            {"role": "user", "content": content_parts}
-        ],
-    )
+    content_parts += [{"type": "image_url", "image_url": {"url": u}} for u in iter_page_images(pdf_bytes, dpi=150, max_pages=20, encodings=encodings)]
+    print(f"Encoded upload: {summarize_encodings(encodings)}")
+    with span("llm"):
+        resp = get_openai_client().chat.completions.create(
+            model=EXTRACT_MODEL,
+            temperature=1,
+            messages=[
+                {"role": "system", "content": "You extract structured data from documents and output strict JSON."},
+                {"role": "user", "content": content_parts}
+            ],
+        )
     raw = resp.choices[0].message.content.strip()
     start = raw.find("{")
     end = raw.rfind("}")
     if start == -1 or end == -1:
         raise ValueError(f"Extractor did not return JSON: {raw}")
 
-    payload = json.loads(raw[start:end+1])
-    return postprocess_payload(payload), content_parts
+    model_json = raw[start:end+1]
+    payload = postprocess_payload(json.loads(model_json))
+    extraction_cache.put(cache_key, payload)
+    return payload, model_json
 
 
-def _save_extracted_student(payload, content_parts, fileName, classId):
-    classObj = Classes.query.get(classId)
-    if not classObj:
-        raise ValueError("Class not found")
+def _build_student(payload, model_json, pdf_bytes, fileName, classObj):
+    # Keep the source PDF out of the row; only its reference is stored.
+    source_ref = blob_store.put(pdf_bytes)
 
-    student = Student(
+    return Student(
         firstName=payload["firstName"],
         middleName=payload["middleName"],
         lastName=payload["lastName"],
@@ -145,20 +167,43 @@ def _save_extracted_student(payload, content_parts, fileName, classId):
         ssn=payload["ssn"],
         studentId=payload["id"],
         email=payload["email"],
-        payload=str(content_parts),
+        payload=model_json,
+        sourceRef=source_ref,
+        registryNumber=normalize_registry_number(payload.get("registryNumber")) or None,
         filename=fileName,
         units=payload["units"],
         modules=payload["modules"],
         receiptDates=payload["receiptDates"],
         receiptAmounts=payload.get("receiptAmounts", []),
-        classId=int(classId),
+        classId=classObj.id,
         graduationDate=payload["graduatedDate"],
         certiDate=classObj.certiDate
     )
+
+
+def _save_extracted_student(payload, model_json, pdf_bytes, fileName, classId):
+    classObj = Classes.query.get(classId)
+    if not classObj:
+        raise ValueError("Class not found")
+
+    student = _build_student(payload, model_json, pdf_bytes, fileName, classObj)
     db.session.add(student)
     db.session.commit()
     return student
 
+def _run_student_job(schema_hint):
+    def handler(job, pdf_bytes, progress):
+        progress("extracting")
+        payload, model_json = _extract_student_payload(pdf_bytes, schema_hint)
+        progress("saving")
+        _save_extracted_student(payload, model_json, pdf_bytes, job.filename, job.classId)
+        return payload
+    return handler
+
+
+register_handler("student", _run_student_job(SCHEMA_HINT))
+register_handler("student_cna", _run_student_job(SCHEMA_HINT_CNA))
+
 @extract_bp.route("/extractData", methods=["GET"])
 def extract():
         
@@ -172,7 +217,10 @@ def extract_pdf():
         return jsonify({"error": "No file part"}), 400
 
     f = request.files["file"]
-    classId = request.form["classId"]
+    try:
+        classId = int(request.form["classId"])
+    except ValueError:
+        return jsonify({"error": "classId must be an integer"}), 400
 
     if f.filename == "":
         return jsonify({"error": "No selected file"}), 400
@@ -191,9 +239,13 @@ def extract_pdf():
     if not pdf_bytes:
         return jsonify({"error": "Empty file"}), 400
 
+    if is_async_request(request):
+        job = submit_job("student", pdf_bytes, fileName, classId)
+        return jsonify({"jobId": job.id, "status": job.status}), 202
+
     try:
-        payload, content_parts = _extract_student_payload(pdf_bytes, SCHEMA_HINT)
-        _save_extracted_student(payload, content_parts, fileName, classId)
+        payload, model_json = _extract_student_payload(pdf_bytes, SCHEMA_HINT)
+        _save_extracted_student(payload, model_json, pdf_bytes, fileName, classId)
         return jsonify(payload), 200    
 
     except Exception as e:
@@ -208,7 +260,10 @@ def extract_pdf_cna():
         return jsonify({"error": "No file part"}), 400
 
     f = request.files["file"]
-    classId = request.form["classId"]
+    try:
+        classId = int(request.form["classId"])
+    except ValueError:
+        return jsonify({"error": "classId must be an integer"}), 400
 
     if f.filename == "":
         return jsonify({"error": "No selected file"}), 400
@@ -225,11 +280,148 @@ def extract_pdf_cna():
     if not pdf_bytes:
         return jsonify({"error": "Empty file"}), 400
 
+    if is_async_request(request):
+        job = submit_job("student_cna", pdf_bytes, fileName, classId)
+        return jsonify({"jobId": job.id, "status": job.status}), 202
+
     try:
-        payload, content_parts = _extract_student_payload(pdf_bytes, SCHEMA_HINT_CNA)
-        _save_extracted_student(payload, content_parts, fileName, classId)
+        payload, model_json = _extract_student_payload(pdf_bytes, SCHEMA_HINT_CNA)
+        _save_extracted_student(payload, model_json, pdf_bytes, fileName, classId)
         return jsonify(payload), 200
 
     except Exception as e:
         print(str(e))
         return jsonify({"error": str(e)}), 500
+
+
+class BatchRejected(ValueError):
+    """The batch upload breaks one of the BATCH_MAX_* limits."""
+
+
+def _collect_batch_files(uploads):
+    """Flatten uploaded PDFs and zip archives into [(filename, bytes)].
+
+    Zip members are checked against BATCH_MAX_FILES and the decompressed size
+    limits from the archive directory before anything is inflated."""
+    files = []
+    total = 0
+
+    def add(name, data):
+        if len(files) >= BATCH_MAX_FILES:
+            raise BatchRejected(f"At most {BATCH_MAX_FILES} files per batch")
+        files.append((name, data))
+
+    for f in uploads:
+        if not f or f.filename == "":
+            continue
+        name = f.filename.lower()
+        if name.endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(f.read())) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or not allowed_file(info.filename):
+                        continue
+                    if info.file_size > BATCH_MAX_FILE_BYTES:
+                        raise BatchRejected(f"{info.filename} is larger than {BATCH_MAX_FILE_BYTES} bytes uncompressed")
+                    total += info.file_size
+                    if total > BATCH_MAX_TOTAL_BYTES:
+                        raise BatchRejected(f"Batch is larger than {BATCH_MAX_TOTAL_BYTES} bytes uncompressed")
+                    # ZipExtFile stops at the declared file_size, so the check above holds.
+                    add(secure_filename(os.path.basename(info.filename)), zf.read(info))
+        elif allowed_file(f.filename):
+            add(secure_filename(f.filename), f.read())
+        else:
+            add(secure_filename(f.filename), None)
+    return files
+
+
+@extract_bp.route("/batch", methods=["POST","OPTIONS"])
+def extract_batch():
+    """Extract a whole class packet: many PDFs (or zips of PDFs) for one classId,
+    run concurrently and saved in a single transaction."""
+    classId = request.form.get("classId")
+    classObj = Classes.query.get(classId) if classId else None
+    if not classObj:
+        return jsonify({"error": "Class not found"}), 404
+
+    schema_hint = SCHEMA_HINT_CNA if request.form.get("cna") in {"1", "true"} else SCHEMA_HINT
+    try:
+        parallel = int(request.form.get("parallel", BATCH_MAX_PARALLEL))
+    except (TypeError, ValueError):
+        return jsonify({"error": "parallel must be an integer"}), 400
+    parallel = max(min(parallel, BATCH_MAX_PARALLEL), 1)
+
+    try:
+        files = _collect_batch_files(request.files.getlist("files") + request.files.getlist("file"))
+    except zipfile.BadZipFile:
+        return jsonify({"error": "Invalid zip archive"}), 400
+    except BatchRejected as e:
+        return jsonify({"error": str(e)}), 400
+    if not files:
+        return jsonify({"error": "No files provided"}), 400
+
+    report = []
+    pending = []
+    seen_names, seen_refs = set(), set()
+    # Per file, not per name: zip members in different folders can share a basename.
+    refs = [ref_for(data) if data else None for _, data in files]
+
+    # One round trip for every filename and content hash already on file.
+    existing_names, existing_refs = set(), set()
+    names = {name for (name, data) in files if data}
+    if names:
+        rows = (
+            db.session.query(Student.filename, Student.sourceRef)
+            .filter(or_(Student.filename.in_(list(names)), Student.sourceRef.in_({r for r in refs if r})))
+            .all()
+        )
+        existing_names = {r.filename for r in rows}
+        existing_refs = {r.sourceRef for r in rows if r.sourceRef}
+
+    for (name, data), ref in zip(files, refs):
+        if data is None:
+            report.append({"filename": name, "status": "failed", "error": "Only PDF is allowed"})
+        elif not data:
+            report.append({"filename": name, "status": "failed", "error": "Empty file"})
+        elif name in existing_names or ref in existing_refs or ref in seen_refs:
+            report.append({"filename": name, "status": "duplicate", "message": "Already scanned"})
+        elif name in seen_names:
+            report.append({"filename": name, "status": "failed", "error": "Another file in this batch has the same name"})
+        else:
+            seen_names.add(name)
+            seen_refs.add(ref)
+            pending.append((name, data))
+
+    def run(item):
+        name, data = item
+        # Building the row stores the PDF too; a bad payload or disk error
+        # fails this file only.
+        try:
+            payload, model_json = _extract_student_payload(data, schema_hint)
+            student = _build_student(payload, model_json, data, name, classObj)
+            return name, payload, student, None
+        except Exception as e:
+            print(f"Batch extraction failed for {name}: {e}")
+            return name, None, None, str(e)
+
+    students = []
+    with ThreadPoolExecutor(max_workers=min(parallel, len(pending)) or 1) as pool:
+        for name, payload, student, error in pool.map(run, pending):
+            if error:
+                report.append({"filename": name, "status": "failed", "error": error})
+                continue
+            students.append(student)
+            report.append({"filename": name, "status": "created", "student": payload})
+
+    try:
+        db.session.add_all(students)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(str(e))
+        return jsonify({"error": str(e), "files": report}), 500
+
+    return jsonify({
+        "classId": classObj.id,
+        "created": len(students),
+        "files": report,
+    }), 200
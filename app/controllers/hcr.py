@@ -1,19 +1,23 @@
 from flask import Blueprint, request, jsonify
 from app.extensions import db
-from sqlalchemy import or_
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from werkzeug.utils import secure_filename
-from openai import OpenAI
-from app.utils.ocrPdf import pdf_to_page_images
-import os
+from app.utils.ocrPdf import iter_page_images, summarize_encodings
+from app.utils.extractCache import extraction_cache, extraction_key
+from app.utils.jobQueue import register_handler, submit_job, is_async_request
+from app.utils.llmClient import get_openai_client
+from app.utils.metrics import span
 import json
 from app.utils.utilExtract import postprocess_payload, pdf_to_data_url,allowed_file
 from app.models.scrap import Scrap
-from app.utils.scrapper import lookup_current_employment
+from app.utils.hcrSweep import sweep_registry_numbers
+from app.utils.pagination import wants_page, keyset_page
+from app.utils.hcrCache import get_cached, store_results, normalize_registry_number, is_force_refresh
 
 hcr_bp = Blueprint("hcr",__name__)
 # ----- Config -----
-OPENAI_API_KEY = os.getenv("OPEN_AI_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+EXTRACT_MODEL = "gpt-5-mini"
 
 SCHEMA_HINT = """
 You are a data extraction engine.
@@ -51,26 +55,193 @@ Required output format:
 """
 
 
+def _extract_roster_payload(pdf_bytes, fileName):
+    cache_key = extraction_key(pdf_bytes, SCHEMA_HINT, EXTRACT_MODEL)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        print(f"Extraction cache hit {cache_key[:12]} for {fileName}")
+        return cached, None
+
+    #Convert to images
+    encodings = []
+    content_parts = [{"type": "text", "text": SCHEMA_HINT}]
+    content_parts += [{"type": "image_url", "image_url": {"url": u}} for u in iter_page_images(pdf_bytes, dpi=150, max_pages=20, encodings=encodings)]
+    print(f"Encoded {fileName}: {summarize_encodings(encodings)}")
+    with span("llm"):
+        resp = get_openai_client().chat.completions.create(
+            model=EXTRACT_MODEL,
+            temperature=1,
+            messages=[
+                {"role": "system", "content": "Extract the requested fields from this document."},
+                {"role": "user", "content": content_parts}
+            ],
+        )
+    raw = resp.choices[0].message.content.strip()
+    # Extract the JSON block safely
+    start = raw.find("[")
+    end = raw.rfind("]")
+    if start == -1 or end == -1:
+        return None, raw
+
+    payload = json.loads(raw[start:end+1])
+    extraction_cache.put(cache_key, payload)
+    return payload, raw
+
+
+def _ingest_roster(payload, fileName):
+    """Save a roster in one transaction: existing scraps are fetched with a
+    single IN query, inserts vs. methodology2 updates are decided in memory,
+    and new rows go out as one upsert on the registry number."""
+    numbers = {e.get("registry_number") for e in payload} - {None, ""}
+    existing = {}
+    if numbers:
+        existing = {s.registryNumber: s for s in Scrap.query.filter(Scrap.registryNumber.in_(numbers)).all()}
+
+    inserts = {}  # registry number (or entry position when missing) -> row values
+    order = []
+    for i, entry in enumerate(payload):
+        number = entry.get("registry_number")
+        methodology = entry.get("methodology")
+
+        current = existing.get(number) if number else None
+        if current is not None:
+            if current.methodology != methodology:
+                current.methodology2 = methodology
+                current.certifiedDate2 = entry.get("certified_date")
+            order.append(current)
+            continue  # skip duplicates
+
+        key = number if number else ("entry", i)
+        values = inserts.get(key)
+        if values is not None:
+            # Same person twice in one roster.
+            if values["methodology"] != methodology:
+                values["methodology2"] = methodology
+                values["certifiedDate2"] = entry.get("certified_date")
+        else:
+            inserts[key] = {
+                "fullName": entry.get("full_name"),
+                "dob": entry.get("date_of_birth"),
+                "startDate": entry.get("start_date"),
+                "certifiedDate": entry.get("certified_date"),
+                "certifiedDate2": "",
+                "registryNumber": number,
+                "methodology": methodology,
+                "methodology2": "",
+                "filename": fileName,
+            }
+        order.append(key)
+
+    try:
+        saved = {}
+        if inserts:
+            # A concurrent upload of the same roster may have inserted the
+            # number meanwhile; treat it like an existing scrap.
+            stmt = pg_insert(Scrap)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Scrap.registryNumber],
+                index_where=and_(Scrap.registryNumber.isnot(None), Scrap.registryNumber != ""),
+                set_={
+                    "methodology2": case(
+                        (Scrap.methodology.is_distinct_from(stmt.excluded.methodology), stmt.excluded.methodology),
+                        else_=Scrap.methodology2,
+                    ),
+                    "certifiedDate2": case(
+                        (Scrap.methodology.is_distinct_from(stmt.excluded.methodology), stmt.excluded.certifiedDate),
+                        else_=Scrap.certifiedDate2,
+                    ),
+                    # The ORM onupdate does not fire for ON CONFLICT; bump it here
+                    # (naive UTC, like the column default) so sync and incremental
+                    # matching see the change.
+                    "updated_at": case(
+                        (Scrap.methodology.is_distinct_from(stmt.excluded.methodology), func.timezone("utc", func.now())),
+                        else_=Scrap.updated_at,
+                    ),
+                },
+            )
+            rows = db.session.scalars(
+                stmt.returning(Scrap, sort_by_parameter_order=True),
+                list(inserts.values()),
+                execution_options={"populate_existing": True},
+            ).all()
+            saved = dict(zip(inserts.keys(), rows))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return [item.to_dict() if isinstance(item, Scrap) else saved[item].to_dict() for item in order]
+
+
+def _run_roster_job(job, pdf_bytes, progress):
+    progress("extracting")
+    payload, raw = _extract_roster_payload(pdf_bytes, job.filename)
+    if payload is None:
+        raise ValueError(f"Extractor did not return JSON Array: {raw}")
+    progress("saving")
+    return _ingest_roster(payload, job.filename)
+
+
+register_handler("roster", _run_roster_job)
+
+
 @hcr_bp.route("/", methods=["GET"])
 def processHCR():    
     print("Starting HCR endpoint processing")
-    scraps = Scrap.query.filter_by(queryStatus="pending").all()
+    scraps = (
+        db.session.query(Scrap.id, Scrap.registryNumber)
+        .filter_by(queryStatus="pending")
+        .order_by(Scrap.id.asc())
+        .all()
+    )
     print(f"Found {len(scraps)} pending scraps to process.")
 
-    for scrap in scraps:
-        if not scrap.registryNumber:
-            print(f"Skipping scrap ID {scrap.id} due to missing registry number.")
-            scrap.queryStatus = "failed"
-            db.session.commit()
-            continue
-        jobInfo = lookup_current_employment(scrap.registryNumber, headless=True)
-        print(f"Registry Number: {scrap.registryNumber} scanned, found {len(jobInfo)} employment records.")
-        scrap.queryStatus = "completed"
-        scrap.agencies = [job["agency"] for job in jobInfo]
-        scrap.workStatus = "employed" if jobInfo else "unemployed"
+    missing = [s.id for s in scraps if not s.registryNumber]
+    if missing:
+        print(f"Skipping {len(missing)} scraps due to missing registry number.")
+        Scrap.query.filter(Scrap.id.in_(missing)).update({"queryStatus": "failed"}, synchronize_session=False)
         db.session.commit()
 
-    return jsonify({"response":"HCR endpoint working","code":200}), 200
+    counts = {"completed": 0, "failed": len(missing)}
+
+    def save_batch(batch, cache=True):
+        updates = []
+        for scrap_id, registry_number, jobInfo, error in batch:
+            if error:
+                print(f"Registry Number: {registry_number} lookup failed: {error}")
+                updates.append({"id": scrap_id, "queryStatus": "failed"})
+                counts["failed"] += 1
+                continue
+            print(f"Registry Number: {registry_number} scanned, found {len(jobInfo)} employment records.")
+            updates.append({
+                "id": scrap_id,
+                "queryStatus": "completed",
+                "agencies": [job["agency"] for job in jobInfo],
+                "workStatus": "employed" if jobInfo else "unemployed",
+            })
+            counts["completed"] += 1
+        db.session.bulk_update_mappings(Scrap, updates)
+        if cache:
+            store_results([(registry_number, jobInfo) for _, registry_number, jobInfo, error in batch if not error])
+        db.session.commit()
+
+    pending = [(s.id, s.registryNumber) for s in scraps if s.registryNumber]
+
+    # Registry numbers looked up recently (here or by a caregiver sync) skip the site.
+    cached = {} if is_force_refresh(request) else get_cached([n for _, n in pending])
+    warm = [(i, n) for i, n in pending if normalize_registry_number(n) in cached]
+    if warm:
+        print(f"Answering {len(warm)} registry numbers from cache.")
+        save_batch([(i, n, cached[normalize_registry_number(n)], None) for i, n in warm], cache=False)
+
+    concurrency = request.args.get("concurrency", type=int)
+    sweep_registry_numbers(
+        [(i, n) for i, n in pending if normalize_registry_number(n) not in cached],
+        save_batch,
+        concurrency=concurrency,
+    )
+
+    return jsonify({"response":"HCR endpoint working","code":200,**counts}), 200
 
 
 @hcr_bp.route("/extractRN", methods=["POST","OPTIONS"])
@@ -93,52 +264,16 @@ def extractRN():
     if not pdf_bytes:
         return jsonify({"error": "Empty file"}), 400
 
+    if is_async_request(request):
+        job = submit_job("roster", pdf_bytes, fileName)
+        return jsonify({"jobId": job.id, "status": job.status}), 202
+
     try:
-        # API CALL
-
-        #Convert to images
-        data_url = pdf_to_page_images(pdf_bytes,dpi=300,max_pages=20)
-        content_parts = [{"type": "text", "text": SCHEMA_HINT}]
-        content_parts += [{"type": "image_url", "image_url": {"url": u}} for u in data_url]
-        resp = client.chat.completions.create(
-            model="gpt-5-mini",
-            temperature=1,
-            messages=[
-                {"role": "system", "content": "Extract the requested fields from this document."},
-                {"role": "user", "content": content_parts}
-            ],
-        )        
-        raw = resp.choices[0].message.content.strip()
-        # Extract the JSON block safely
-        start = raw.find("[")
-        end = raw.rfind("]")
-        if start == -1 or end == -1:
+        payload, raw = _extract_roster_payload(pdf_bytes, fileName)
+        if payload is None:
             return jsonify({"error": "Extractor did not return JSON Array", "raw": raw}), 502
-            
-        payload = json.loads(raw[start:end+1])
-        result = []
-        for entry in payload:
-            validate = Scrap.query.filter_by(registryNumber=entry.get("registry_number")).first()
-            if validate:
-                if validate.methodology != entry.get("methodology"):
-                    validate.methodology2 = entry.get("methodology")
-                    validate.certifiedDate2 = entry.get("certified_date")
-                    db.session.commit()
-                result.append(validate.to_dict())
-                continue  # skip duplicates
-            scrap = Scrap(
-                fullName=entry.get("full_name"),
-                dob=entry.get("date_of_birth"),
-                startDate=entry.get("start_date"),
-                certifiedDate=entry.get("certified_date"),
-                registryNumber=entry.get("registry_number"),
-                methodology=entry.get("methodology"),
-                filename=fileName
-            )
-            db.session.add(scrap)
-            db.session.commit()
-            result.append(scrap.to_dict())
 
+        result = _ingest_roster(payload, fileName)
         return jsonify(result), 200    
 
     except Exception as e:
@@ -161,6 +296,9 @@ def search_scraps_by_name():
         pattern = f"%{name}%"
         query = query.filter(Scrap.fullName.ilike(pattern))
 
+    if wants_page(request.args):
+        return jsonify(keyset_page(query, Scrap, request.args, lambda scrap: scrap.to_dict()))
+
     scraps = query.order_by(Scrap.id.asc()).all()
     return jsonify([scrap.to_dict() for scrap in scraps])
 
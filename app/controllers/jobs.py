@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify
+from app.models.job import ExtractionJob
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+@jobs_bp.route("/<int:id>", methods=["GET"])
+def get_job(id):
+    job = ExtractionJob.query.get(id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+from app.utils.metrics import render_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("", methods=["GET"])
+@metrics_bp.route("/", methods=["GET"])
+def metrics():
+    """Request latency, per-request SQL and step timings in Prometheus text format."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,8 +1,12 @@
+import base64
+import json
 from flask import Blueprint, request, jsonify
-from sqlalchemy import or_, func
+from sqlalchemy import and_, or_, func, literal_column, tuple_
 from sqlalchemy.exc import SQLAlchemyError
 from app.extensions import db
 from app.models.referral import Referral
+from app.utils.countCache import cached_count
+from app.utils.matching import run_matching
 from datetime import datetime
 
 
@@ -20,12 +24,47 @@ def _parse_filter_date(value):
 
     for fmt in ("%m/%d/%Y", "%Y-%m-%d", "%m-%d-%Y"):
         try:
-            return datetime.strptime(value.strip(), fmt).strftime("%Y-%m-%d")
+            return datetime.strptime(value.strip(), fmt).date()
         except ValueError:
             continue
     return None
 
 
+# Sort key of the listing; both expressions match ix_referral_methodology_sort*.
+# A missing created_at sorts as the epoch so the key is never NULL and keyset
+# comparisons stay simple.
+CREATED_AT_FLOOR = datetime(1970, 1, 1)
+
+
+def _methodology_sort():
+    return func.coalesce(Referral.methodology1, Referral.methodology2, "")
+
+
+def _created_at_sort():
+    return func.coalesce(Referral.created_at, literal_column("'1970-01-01'::timestamp"))
+
+
+def _sort_values(referral):
+    methodology = referral.methodology1
+    if methodology is None:
+        methodology = referral.methodology2 if referral.methodology2 is not None else ""
+    return methodology, referral.created_at or CREATED_AT_FLOOR, referral.id
+
+
+def _encode_cursor(referral):
+    methodology, created_at, id = _sort_values(referral)
+    raw = json.dumps([methodology, created_at.isoformat(), id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    try:
+        methodology, created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(methodology), datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        return None
+
+
 @referral_bp.route("/", methods=["GET"])
 def list_referrals():
     query = Referral.query
@@ -33,13 +72,14 @@ def list_referrals():
     name = (request.args.get("name") or "").strip()
     city = (request.args.get("city") or "").strip()
     graduation_date = (request.args.get("graduationDate") or "").strip()
+    graduation_date_on = _parse_filter_date(graduation_date)
     graduation_date_from = _parse_filter_date(request.args.get("graduationDateFrom") or "")
     graduation_date_to = _parse_filter_date(request.args.get("graduationDateTo") or "")
     methodology_order = (request.args.get("methodologyOrder") or "asc").lower()
     page = max(int(request.args.get("page", 1)), 1)
     per_page = max(min(int(request.args.get("perPage", 20)), 100), 1)
-    graduation_date1_expr = func.to_date(Referral.graduationDate1, 'MM/DD/YYYY')
-    graduation_date2_expr = func.to_date(Referral.graduationDate2, 'MM/DD/YYYY')
+    count_mode = (request.args.get("count") or "cached").lower()
+    keyset = "cursor" in request.args
 
     if name:
         pattern = f"%{name}%"
@@ -54,7 +94,9 @@ def list_referrals():
     if city:
         query = query.filter(Referral.city.ilike(f"%{city}%"))
 
-    if graduation_date:
+    if graduation_date_on:
+        graduation_date_from = graduation_date_to = graduation_date_on
+    elif graduation_date:
         query = query.filter(
             or_(
                 Referral.graduationDate1 == graduation_date,
@@ -62,39 +104,81 @@ def list_referrals():
             )
         )
 
-    if graduation_date_from:
-        query = query.filter(
-            or_(
-                graduation_date1_expr >= graduation_date_from,
-                graduation_date2_expr >= graduation_date_from,
-            )
-        )
-
-    if graduation_date_to:
-        query = query.filter(
-            or_(
-                graduation_date1_expr <= graduation_date_to,
-                graduation_date2_expr <= graduation_date_to,
-            )
-        )
-
-    methodology_sort = func.coalesce(Referral.methodology1, Referral.methodology2, "")
+    # One range per typed column, OR-ed: two index range scans.
+    if graduation_date_from or graduation_date_to:
+        ranges = []
+        for column in (Referral.graduationDate1On, Referral.graduationDate2On):
+            bounds = []
+            if graduation_date_from:
+                bounds.append(column >= graduation_date_from)
+            if graduation_date_to:
+                bounds.append(column <= graduation_date_to)
+            ranges.append(and_(*bounds))
+        query = query.filter(or_(*ranges))
+
+    count_key = (
+        "referrals", name.lower(), city.lower(), graduation_date,
+        str(graduation_date_from or ""), str(graduation_date_to or ""),
+    )
+    filtered = query
+
+    methodology_sort = _methodology_sort()
+    created_at_sort = _created_at_sort()
     if methodology_order == "desc":
-        query = query.order_by(methodology_sort.desc(), Referral.created_at.desc(), Referral.id.desc())
+        query = query.order_by(methodology_sort.desc(), created_at_sort.desc(), Referral.id.desc())
     else:
-        query = query.order_by(methodology_sort.asc(), Referral.created_at.desc(), Referral.id.desc())
+        query = query.order_by(methodology_sort.asc(), created_at_sort.desc(), Referral.id.desc())
 
     try:
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        return jsonify({
-            "items": [referral.to_dict() for referral in pagination.items],
-            "page": pagination.page,
-            "perPage": pagination.per_page,
-            "total": pagination.total,
-            "pages": pagination.pages,
-            "hasNext": pagination.has_next,
-            "hasPrev": pagination.has_prev,
-        })
+        # Keyset mode: ?cursor= (empty for the first page) continues after the
+        # last row of the previous page, so every page costs the same.
+        if keyset:
+            after = _decode_cursor(request.args.get("cursor")) if request.args.get("cursor") else None
+            if request.args.get("cursor") and not after:
+                return jsonify({"error": "Invalid cursor"}), 400
+            if after:
+                methodology, created_at, id = after
+                if methodology_order == "desc":
+                    query = query.filter(
+                        tuple_(methodology_sort, created_at_sort, Referral.id) < tuple_(methodology, created_at, id)
+                    )
+                else:
+                    # The >= bound lets the index scan start at the cursor's
+                    # methodology instead of walking every earlier entry.
+                    query = query.filter(
+                        methodology_sort >= methodology,
+                        or_(
+                            methodology_sort > methodology,
+                            and_(
+                                methodology_sort == methodology,
+                                tuple_(created_at_sort, Referral.id) < tuple_(created_at, id),
+                            ),
+                        ),
+                    )
+            rows = query.limit(per_page + 1).all()
+        else:
+            rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        total, total_exact = cached_count(count_key, filtered, count_mode)
+
+        result = {
+            "items": [referral.to_dict() for referral in rows],
+            "perPage": per_page,
+            "total": total,
+            "totalExact": total_exact,
+            "hasNext": has_next,
+        }
+        if keyset:
+            result["nextCursor"] = _encode_cursor(rows[-1]) if has_next else None
+        else:
+            result.update({
+                "page": page,
+                "pages": -(-total // per_page) if total else 0,
+                "hasPrev": page > 1,
+            })
+        return jsonify(result)
     except SQLAlchemyError as exc:
         db.session.rollback()
         return jsonify({
@@ -103,6 +187,25 @@ def list_referrals():
         }), 500
 
 
+@referral_bp.route("/match", methods=["POST"])
+def match_referrals():
+    """Run the Student/Scrap matcher. Body: {"mode": "full" | "incremental"}."""
+    data = request.get_json(silent=True) or {}
+    mode = (data.get("mode") or request.args.get("mode") or "incremental").lower()
+    if mode not in {"full", "incremental"}:
+        return jsonify({"error": "mode must be 'full' or 'incremental'"}), 400
+
+    try:
+        run = run_matching(mode)
+        return jsonify(run.to_dict()), 200
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        return jsonify({
+            "error": "Unable to match referrals",
+            "details": str(exc.__cause__ or exc),
+        }), 500
+
+
 @referral_bp.route("/<int:id>", methods=["PUT", "PATCH"])
 def update_referral(id):
     data = request.get_json() or {}
@@ -0,0 +1,51 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy.exc import SQLAlchemyError
+from app.extensions import db
+from app.utils.search import (
+    SEARCH_ENTITIES,
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_MAX_LIMIT,
+    ranked_name_matches,
+    set_search_threshold,
+)
+
+search_bp = Blueprint("search", __name__)
+
+
+@search_bp.route("", methods=["GET"])
+@search_bp.route("/", methods=["GET"])
+def search():
+    """Fuzzy name search across students, scraps, caregivers and referrals.
+
+    ?q=<name>&limit=<per entity>&types=students,scraps,... Each entity returns
+    its best matches ranked by trigram similarity, with the score on every item."""
+    term = (request.args.get("q") or request.args.get("name") or "").strip()
+    if not term:
+        return jsonify({"error": "q is required"}), 400
+
+    limit = request.args.get("limit", SEARCH_DEFAULT_LIMIT, type=int) or SEARCH_DEFAULT_LIMIT
+    limit = max(min(limit, SEARCH_MAX_LIMIT), 1)
+
+    types = [t.strip() for t in (request.args.get("types") or "").split(",") if t.strip()]
+    types = types or list(SEARCH_ENTITIES)
+    invalid = [t for t in types if t not in SEARCH_ENTITIES]
+    if invalid:
+        return jsonify({"error": "Invalid types", "types": invalid}), 400
+
+    result = {"query": term}
+    try:
+        set_search_threshold()
+        for entity in types:
+            result[entity] = [
+                {**row.to_dict(), "score": score}
+                for row, score in ranked_name_matches(entity, term, limit)
+            ]
+        db.session.rollback()
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        return jsonify({
+            "error": "Search failed",
+            "details": str(exc.__cause__ or exc),
+        }), 500
+
+    return jsonify(result)
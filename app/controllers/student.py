@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from sqlalchemy import or_
 from sqlalchemy.orm import defer
 from app.extensions import db
@@ -6,7 +6,11 @@ from app.models.student import Student
 from app.models.classes import Classes
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from app.utils.injectData import injectTemplate, injectCnaTemplate, injectUploadedTemplate, injectLocalTemplate, getFinalGrade, getGPA, parseFinalGrade, getFinalGradeSAP, getCnaFinalGrade, getCnaFinalGradeSAP, insertLedgerValues, insertCnaLedgerValues
+from app.utils.pagination import wants_page, keyset_page
+from app.utils.renderPool import stream_rendered_zip, render_docx
+from app.utils.pdfRender import render_pdf
+from io import BytesIO
+from app.utils.injectData import templateDigest, injectTemplate, injectCnaTemplate, injectUploadedTemplate, injectLocalTemplate, getFinalGrade, getGPA, parseFinalGrade, getFinalGradeSAP, getCnaFinalGrade, getCnaFinalGradeSAP, insertLedgerValues, insertCnaLedgerValues
 
 student_bp = Blueprint("students", __name__)
 
@@ -66,6 +70,26 @@ def _build_receipt_replacements(form):
         "@uniform": pricing["uniform"],
     }
 
+TEMPLATE_TYPE_NAMES = ["Ledger", "Progress", "Transcript", "SAP"]
+
+def _wants_pdf():
+    return (request.args.get("format") or "").lower() == "pdf"
+
+
+def _send_pdf(replacements, type, cna, download_name):
+    try:
+        data = render_pdf(templateDigest(type, cna), replacements, lambda: render_docx(replacements, type, cna))
+    except Exception as e:
+        print(f"PDF conversion failed: {e}")
+        return jsonify({"error": "PDF conversion failed", "details": str(e)}), 500
+
+    return send_file(
+        BytesIO(data),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name=download_name + ".pdf"
+    )
+
 UPDATABLE_STUDENT_FIELDS = {
     "firstName",
     "middleName",
@@ -92,7 +116,11 @@ UPDATABLE_STUDENT_FIELDS = {
 
 @student_bp.route("/", methods=["GET"])
 def list_student():
-    list = Student.query.all()
+    query = Student.query.options(defer(Student.payload))
+    if wants_page(request.args):
+        return jsonify(keyset_page(query, Student, request.args, lambda c: c.to_dict()))
+
+    list = query.all()
     return jsonify([c.to_dict() for c in list])
 
 
@@ -111,6 +139,9 @@ def search_students_by_name():
             )
         )
 
+    if wants_page(request.args):
+        return jsonify(keyset_page(query, Student, request.args, lambda student: student.to_dict()))
+
     students = query.order_by(Student.id.asc()).all()
     return jsonify([student.to_dict() for student in students])
 
@@ -211,12 +242,9 @@ def updateStudentWorkStatus():
     else:
         return jsonify({"error": "Student not found"}), 404    
 
-@student_bp.route("/generateFiles/<int:type>", methods=["POST"])
-def generateFiles(type):
-    student = request.get_json() or {}          
+def _build_replacements(student, classObj):
     address = student.get("address").split(",")
     ssn = student.get("ssn")
-    classObj = Classes.query.get(student.get("classId"))    
 
     replacements = {
         "@firstName": student.get("firstName"),
@@ -320,7 +348,18 @@ def generateFiles(type):
     replacements["@gpa"] = str(getGPA(finalGrade))
     replacements["@sapGpa"] =str(getGPA(finalGradeSAP))
     insertLedgerValues(replacements,student,classObj)
-    
+    return replacements
+
+
+@student_bp.route("/generateFiles/<int:type>", methods=["POST"])
+def generateFiles(type):
+    student = request.get_json() or {}          
+    classObj = Classes.query.get(student.get("classId"))    
+    replacements = _build_replacements(student, classObj)
+
+    if _wants_pdf():
+        return _send_pdf(replacements, type, False, student.get("firstName")+student.get("lastName"))
+
     file = injectTemplate(replacements,type)    
     return send_file(
         file,
@@ -330,15 +369,9 @@ def generateFiles(type):
     )
 
 
-@student_bp.route("/generateCnaFiles/<int:type>", methods=["POST"])
-def generateCnaFiles(type):
-    student = request.get_json() or {}
+def _build_cna_replacements(student, classObj):
     address = (student.get("address") or ",,,").split(",")
     ssn = student.get("ssn") or ""
-    classObj = Classes.query.get(student.get("classId"))
-
-    if not classObj:
-        return jsonify({"error": "Class not found"}), 404
 
     while len(address) < 4:
         address.append("")
@@ -405,6 +438,21 @@ def generateCnaFiles(type):
     replacements["@gpa"] = str(getGPA(finalGrade))
     replacements["@sapGpa"] = str(getGPA(finalGradeSAP))
     insertCnaLedgerValues(replacements, student, classObj)
+    return replacements
+
+
+@student_bp.route("/generateCnaFiles/<int:type>", methods=["POST"])
+def generateCnaFiles(type):
+    student = request.get_json() or {}
+    classObj = Classes.query.get(student.get("classId"))
+
+    if not classObj:
+        return jsonify({"error": "Class not found"}), 404
+
+    replacements = _build_cna_replacements(student, classObj)
+
+    if _wants_pdf():
+        return _send_pdf(replacements, type, True, student.get("firstName", "") + student.get("lastName", ""))
 
     file = injectCnaTemplate(replacements, type)
     return send_file(
@@ -413,3 +461,61 @@ def generateCnaFiles(type):
         as_attachment=True,
         download_name=student.get("firstName", "") + student.get("lastName", "")
     )
+
+
+@student_bp.route("/generateClassFiles", methods=["POST"])
+def generateClassFiles():
+    """Every student of a class x the requested template types, rendered in
+    worker processes and streamed back as a zip while documents finish."""
+    data = request.get_json() or {}
+    classObj = Classes.query.get(data.get("classId"))
+    if not classObj:
+        return jsonify({"error": "Class not found"}), 404
+
+    types = data.get("types") or list(range(len(TEMPLATE_TYPE_NAMES)))
+    invalid_types = [t for t in types if not isinstance(t, int) or not 0 <= t < len(TEMPLATE_TYPE_NAMES)]
+    if invalid_types:
+        return jsonify({"error": "Invalid template types", "types": invalid_types}), 400
+
+    cna = bool(data.get("cna"))
+    pdf = (data.get("format") or "").lower() == "pdf"
+    extension = "pdf" if pdf else "docx"
+    students = (
+        Student.query.options(defer(Student.payload))
+        .filter_by(classId=classObj.id)
+        .order_by(Student.id.asc())
+        .all()
+    )
+    if not students:
+        return jsonify({"error": "Class has no students"}), 404
+
+    # Everything that touches the DB happens here, before streaming starts.
+    jobs = []
+    errors = []
+    for student in students:
+        student_dict = student.to_dict()
+        base_name = f"{student.firstName}{student.lastName}_{student.id}"
+        try:
+            replacements = _build_cna_replacements(student_dict, classObj) if cna else _build_replacements(student_dict, classObj)
+        except Exception as e:
+            errors.append(f"{base_name}: {e}")
+            continue
+        for type in types:
+            jobs.append((f"{base_name}/{base_name}{TEMPLATE_TYPE_NAMES[type]}.{extension}", replacements, type, cna, pdf))
+
+    def generate():
+        chunks = stream_rendered_zip(jobs, errors)
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield chunk
+        finally:
+            # Runs when the client disconnects too; cancels the renders not started yet.
+            chunks.close()
+
+    download_name = secure_filename(f"{classObj.course}_{classObj.id}.zip") or "class.zip"
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={download_name}"},
+    )
@@ -1,4 +1,5 @@
 from app.extensions import db
+from datetime import datetime
 from sqlalchemy.dialects.postgresql import ARRAY
 
 
@@ -17,6 +18,7 @@ class Caregiver(db.Model):
     queryStatus = db.Column(db.String(50), nullable=True, default="pending")
     workStartDate = db.Column(db.DateTime, nullable=True)
     benefitStatus = db.Column(db.String(50), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     def to_dict(self):
         return {
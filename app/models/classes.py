@@ -1,4 +1,5 @@
 from app.extensions import db
+from datetime import datetime
 from sqlalchemy.dialects.postgresql import ARRAY
 
 class Classes(db.Model):
@@ -22,6 +23,13 @@ class Classes(db.Model):
     dateModules = db.Column(ARRAY(db.String),default=[])
     classType = db.Column(db.Integer,nullable=False) #1:PCA, 2: Upgrade, 3:HHA
     midpoint = db.Column(db.String)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Parsed copies of the string dates, generated by Postgres (see parse_loose_date)
+    startDateOn = db.Column(db.Date, db.Computed('parse_loose_date("startDate")', persisted=True), index=True)
+    endDateOn = db.Column(db.Date, db.Computed('parse_loose_date("endDate")', persisted=True))
+    graduationDateOn = db.Column(db.Date, db.Computed('parse_loose_date("graduationDate")', persisted=True), index=True)
+    certiDateOn = db.Column(db.Date, db.Computed('parse_loose_date("certiDate")', persisted=True))
+    midpointOn = db.Column(db.Date, db.Computed('parse_loose_date("midpoint")', persisted=True))
     
     def __repr__(self):
         return f"<Class {self.firstName} {self.program}>"
@@ -0,0 +1,15 @@
+from app.extensions import db
+
+
+class HcrLookup(db.Model):
+    """Last employment history fetched from the Home Care Registry, shared by
+    scraps and caregivers with the same registry number."""
+    __tablename__ = "hcr_lookups"
+
+    registry_number = db.Column(db.String(100), primary_key=True)
+    employment = db.Column(db.JSON, nullable=False, default=list)
+    found = db.Column(db.Boolean, nullable=False, default=False)
+    fetched_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<HcrLookup {self.registry_number}>"
@@ -0,0 +1,41 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class ExtractionJob(db.Model):
+    __tablename__ = "extraction_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # "student", "student_cna", "roster"
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)  # queued, running, completed, failed
+    progress = db.Column(db.String(100), nullable=True)
+    filename = db.Column(db.String(200), nullable=False)
+    classId = db.Column(db.Integer, nullable=True)
+    sourceRef = db.Column(db.String(80), nullable=False)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Refreshed while a worker runs the job; a stale one means the worker died.
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return f"<ExtractionJob {self.id} {self.kind} {self.status}>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "filename": self.filename,
+            "classId": self.classId,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "attempts": self.attempts,
+        }
@@ -0,0 +1,32 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class MatchingRun(db.Model):
+    """One pass of the Student/Scrap matcher; the last completed run is the
+    starting point of an incremental run."""
+    __tablename__ = "matching_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(20), nullable=False)  # "full", "incremental"
+    status = db.Column(db.String(20), nullable=False, default="running")  # running, completed, failed
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    max_student_id = db.Column(db.Integer, nullable=True)
+    max_scrap_id = db.Column(db.Integer, nullable=True)
+    stats = db.Column(db.JSON, nullable=True)
+
+    def __repr__(self):
+        return f"<MatchingRun {self.id} {self.mode} {self.status}>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "max_student_id": self.max_student_id,
+            "max_scrap_id": self.max_scrap_id,
+            "stats": self.stats,
+        }
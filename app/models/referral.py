@@ -1,12 +1,17 @@
 from app.extensions import db
+from datetime import datetime
 
 
 class Referral(db.Model):
     __tablename__ = "referral"
+    __table_args__ = (
+        # One referral per pair; the matcher upserts on it.
+        db.Index("ux_referral_student_scrap", "student_id", "scrap_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, nullable=True)
-    scrap_id = db.Column(db.Integer, nullable=True)
+    student_id = db.Column(db.Integer, nullable=True, index=True)
+    scrap_id = db.Column(db.Integer, nullable=True, index=True)
     student_full_name = db.Column(db.String(300), nullable=True)
     scrap_full_name = db.Column(db.String(300), nullable=True)
     fullName = db.Column("fullName", db.String(300), nullable=False)
@@ -28,6 +33,11 @@ class Referral(db.Model):
     agency = db.Column(db.String(200), nullable=True)
     assigned_date = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Parsed copies of the string dates, generated by Postgres (see parse_loose_date)
+    dobOn = db.Column(db.Date, db.Computed('parse_loose_date("dob")', persisted=True), index=True)
+    graduationDate1On = db.Column(db.Date, db.Computed('parse_loose_date("graduationDate1")', persisted=True), index=True)
+    graduationDate2On = db.Column(db.Date, db.Computed('parse_loose_date("graduationDate2")', persisted=True), index=True)
 
     def to_dict(self):
         return {
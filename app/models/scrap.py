@@ -1,8 +1,18 @@
 from app.extensions import db
+from datetime import datetime
 from sqlalchemy.dialects.postgresql import ARRAY
 
 class Scrap(db.Model):
     __tablename__ = "scrap"
+    __table_args__ = (
+        # One scrap per registry number; rosters upsert on it.
+        db.Index(
+            "ux_scrap_registry_number",
+            "registryNumber",
+            unique=True,
+            postgresql_where=db.text("\"registryNumber\" IS NOT NULL AND \"registryNumber\" <> ''"),
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     fullName = db.Column(db.String(100), nullable=False)
@@ -19,6 +29,12 @@ class Scrap(db.Model):
     queryStatus = db.Column(db.String(50), nullable=True, default="pending") # e.g., "completed", "failed"," pending"
     workStartDate = db.Column(db.DateTime, nullable=True)
     benefitStatus = db.Column(db.String(50), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Parsed copies of the string dates, generated by Postgres (see parse_loose_date)
+    dobOn = db.Column(db.Date, db.Computed('parse_loose_date("dob")', persisted=True), index=True)
+    startDateOn = db.Column(db.Date, db.Computed('parse_loose_date("startDate")', persisted=True))
+    certifiedDateOn = db.Column(db.Date, db.Computed('parse_loose_date("certifiedDate")', persisted=True))
+    certifiedDate2On = db.Column(db.Date, db.Computed('parse_loose_date("certifiedDate2")', persisted=True))
 
     def __repr__(self):
         return f"<Scrap {self.fullName}>"
@@ -1,4 +1,5 @@
 from app.extensions import db
+from datetime import datetime
 from sqlalchemy.dialects.postgresql import ARRAY
 
 class Student(db.Model):
@@ -14,7 +15,9 @@ class Student(db.Model):
     ssn = db.Column(db.String(20), nullable=False)
     studentId = db.Column(db.String(20), nullable=False)
     email = db.Column(db.String(120), nullable=False)
-    payload = db.Column(db.String, nullable=False)
+    payload = db.Column(db.String, nullable=False)  # raw extractor JSON
+    sourceRef = db.Column(db.String(80), nullable=True, index=True)  # blob store ref of the source PDF
+    registryNumber = db.Column(db.String(40), nullable=True, index=True)  # normalized, from the extractor JSON
     filename = db.Column(db.String, unique=True, nullable=False)
     units = db.Column(ARRAY(db.String),default=[])
     modules = db.Column(ARRAY(db.String),default=[])
@@ -29,6 +32,11 @@ class Student(db.Model):
     interested = db.Column(db.String(10), nullable=True, default="")
     lot= db.Column(db.Integer, nullable=True, default=0)
     campaign= db.Column(db.Integer, nullable=True, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Parsed copies of the string dates, generated by Postgres (see parse_loose_date)
+    dobOn = db.Column(db.Date, db.Computed('parse_loose_date("dob")', persisted=True), index=True)
+    graduationDateOn = db.Column(db.Date, db.Computed('parse_loose_date("graduationDate")', persisted=True), index=True)
+    certiDateOn = db.Column(db.Date, db.Computed('parse_loose_date("certiDate")', persisted=True))
 
     
 
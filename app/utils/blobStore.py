@@ -0,0 +1,63 @@
+import gzip
+import hashlib
+import os
+
+from app.utils.diskCache import write_atomic
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(".cache", "blobs"))
+BLOB_STORE_COMPRESS = os.getenv("BLOB_STORE_COMPRESS", "1") == "1"
+
+REF_PREFIX = "sha256:"
+
+
+def ref_for(data: bytes) -> str:
+    """Reference a blob would get, without storing it."""
+    return REF_PREFIX + hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """Content-addressed store for source artifacts (uploaded PDFs, legacy
+    payloads) kept on the local filesystem instead of in table rows.
+
+    Blobs are addressed by the SHA-256 of their uncompressed bytes and
+    referenced from rows as "sha256:<hex>"."""
+
+    def __init__(self, directory, compress=True):
+        self.directory = directory
+        self.compress = compress
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:4], digest)
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path) or os.path.exists(path + ".gz"):
+            return REF_PREFIX + digest
+
+        if self.compress:
+            path += ".gz"
+            data = gzip.compress(data, compresslevel=6)
+
+        write_atomic(path, data)
+        return REF_PREFIX + digest
+
+    def get(self, ref: str) -> bytes:
+        if not ref or not ref.startswith(REF_PREFIX):
+            raise ValueError(f"Invalid blob reference: {ref}")
+
+        path = self._path(ref[len(REF_PREFIX):])
+        if os.path.exists(path + ".gz"):
+            with gzip.open(path + ".gz", "rb") as f:
+                return f.read()
+        with open(path, "rb") as f:
+            return f.read()
+
+    def exists(self, ref: str) -> bool:
+        if not ref or not ref.startswith(REF_PREFIX):
+            return False
+        path = self._path(ref[len(REF_PREFIX):])
+        return os.path.exists(path) or os.path.exists(path + ".gz")
+
+
+blob_store = BlobStore(BLOB_STORE_DIR, compress=BLOB_STORE_COMPRESS)
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.extensions import db
+
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL_SECONDS", "300"))
+COUNT_CACHE_ENTRIES = int(os.getenv("COUNT_CACHE_ENTRIES", "1000"))
+
+# key -> (total, counted_at), least recently used first
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def estimated_count(query):
+    """Row estimate from the planner (EXPLAIN), without running the query."""
+    stmt = query.order_by(None).statement
+    compiled = stmt.compile(dialect=db.session.get_bind().dialect)
+    plan = db.session.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def cached_count(key, query, mode="cached"):
+    """Total rows of `query` as (total, exact).
+
+    mode "exact" always counts and refreshes the cache, "estimate" only asks
+    the planner, and "cached" (the default) reuses a count taken in the last
+    COUNT_CACHE_TTL seconds for the same `key`, counting once when there is none."""
+    if mode == "estimate":
+        return estimated_count(query), False
+
+    now = time.monotonic()
+    if mode != "exact":
+        with _counts_lock:
+            hit = _counts.get(key)
+            if hit and now - hit[1] < COUNT_CACHE_TTL:
+                _counts.move_to_end(key)
+                return hit[0], False
+
+    total = query.order_by(None).count()
+    with _counts_lock:
+        _counts[key] = (total, now)
+        _counts.move_to_end(key)
+        # Every distinct filter gets its own key; keep the newest ones only.
+        while len(_counts) > COUNT_CACHE_ENTRIES:
+            _counts.popitem(last=False)
+    return total, True
+
+
+def invalidate_counts(prefix):
+    """Drop cached counts whose key starts with `prefix`, after bulk writes."""
+    with _counts_lock:
+        for key in [k for k in _counts if k[0] == prefix]:
+            del _counts[key]
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import threading
+import time
+
+# Cache directories are trimmed once every this many writes (and on the first
+# write of a process) instead of on every write.
+DISK_CACHE_EVICT_EVERY = int(os.getenv("DISK_CACHE_EVICT_EVERY", "100"))
+# Temp files older than this are left over from a crashed writer.
+STALE_TMP_SECONDS = 3600
+
+
+def write_atomic(path, data: bytes):
+    """Write `data` to `path` through a unique temp file in the same
+    directory, so concurrent writers (threads or processes) never share one."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class DiskEvictor:
+    """Keeps a cache directory at `max_entries` files ending in `suffix`,
+    dropping the least recently used (oldest mtime) first. Between sweeps the
+    directory may hold up to `every` extra entries."""
+
+    def __init__(self, directory, suffix, max_entries, every=DISK_CACHE_EVICT_EVERY):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_entries = max_entries
+        self.every = max(1, every)
+        self._writes = self.every - 1
+        self._lock = threading.Lock()
+        self._sweeping = threading.Lock()
+
+    def wrote(self):
+        """Count one write and sweep when it is due."""
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.every == 0
+        # A sweep already running in another thread covers this one.
+        if due and self._sweeping.acquire(blocking=False):
+            try:
+                self.evict()
+            finally:
+                self._sweeping.release()
+
+    def evict(self):
+        entries = []
+        stale_before = time.time() - STALE_TMP_SECONDS
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full = os.path.join(root, name)
+                try:
+                    mtime = os.path.getmtime(full)
+                except OSError:
+                    continue
+                if name.endswith(self.suffix):
+                    entries.append((mtime, full))
+                elif name.endswith(".tmp") and mtime < stale_before:
+                    _remove(full)
+
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, full in entries[:len(entries) - self.max_entries]:
+            _remove(full)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
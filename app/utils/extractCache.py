@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from app.utils.diskCache import DiskEvictor, write_atomic
+
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", os.path.join(".cache", "extract"))
+EXTRACT_CACHE_MEMORY_ENTRIES = int(os.getenv("EXTRACT_CACHE_MEMORY_ENTRIES", "256"))
+EXTRACT_CACHE_DISK_ENTRIES = int(os.getenv("EXTRACT_CACHE_DISK_ENTRIES", "5000"))
+
+
+def extraction_key(pdf_bytes: bytes, schema_hint: str, model: str) -> str:
+    """SHA-256 over the PDF content, the prompt and the model, so the same
+    packet uploaded under another filename maps to the same entry."""
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(pdf_bytes).digest())
+    h.update(hashlib.sha256(schema_hint.encode("utf-8")).digest())
+    h.update(model.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """Two-tier cache of extractor output: an in-process LRU in front of a
+    directory of JSON files that is shared by workers and survives restarts."""
+
+    def __init__(self, directory, memory_entries, disk_entries):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictor = DiskEvictor(directory, ".json", disk_entries) if directory else None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _remember(self, key, raw):
+        with self._lock:
+            self._memory[key] = raw
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            raw = self._memory.get(key)
+            if raw is not None:
+                self._memory.move_to_end(key)
+
+        if raw is None and self.directory:
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+                os.utime(path)  # bump recency for disk eviction
+            except OSError:
+                return None
+            self._remember(key, raw)
+
+        # Hand out a fresh copy; callers mutate payloads.
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, key, value):
+        raw = json.dumps(value)
+        self._remember(key, raw)
+        if not self.directory:
+            return
+
+        try:
+            write_atomic(self._path(key), raw.encode("utf-8"))
+            self._evictor.wrote()
+        except OSError as e:
+            print(f"Extraction cache write failed: {e}")
+
+
+extraction_cache = ExtractionCache(EXTRACT_CACHE_DIR, EXTRACT_CACHE_MEMORY_ENTRIES, EXTRACT_CACHE_DISK_ENTRIES)
@@ -0,0 +1,74 @@
+import os
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.extensions import db
+from app.models.hcrLookup import HcrLookup
+from app.utils.scrapper import lookup_current_employment
+
+HCR_CACHE_TTL_HOURS = float(os.getenv("HCR_CACHE_TTL_HOURS", "24"))
+# Empty results ("not found" / no employment) are rechecked sooner.
+HCR_CACHE_NEGATIVE_TTL_HOURS = float(os.getenv("HCR_CACHE_NEGATIVE_TTL_HOURS", "6"))
+
+
+def normalize_registry_number(value):
+    if value is None:
+        return ""
+    return re.sub(r"[\s\-]", "", str(value))
+
+
+def _is_fresh(entry, now):
+    ttl = HCR_CACHE_TTL_HOURS if entry.found else HCR_CACHE_NEGATIVE_TTL_HOURS
+    return entry.fetched_at >= now - timedelta(hours=ttl)
+
+
+def get_cached(registry_numbers):
+    """Fresh cache entries for many registry numbers in one query:
+    {normalized number: employment list}."""
+    keys = {normalize_registry_number(n) for n in registry_numbers} - {""}
+    if not keys:
+        return {}
+
+    now = datetime.utcnow()
+    entries = HcrLookup.query.filter(HcrLookup.registry_number.in_(list(keys))).all()
+    return {e.registry_number: e.employment for e in entries if _is_fresh(e, now)}
+
+
+def store_results(results):
+    """Upsert [(registry_number, employment)] into the cache. The caller commits."""
+    now = datetime.utcnow()
+    rows = {}
+    for number, employment in results:
+        key = normalize_registry_number(number)
+        if key:
+            rows[key] = {"registry_number": key, "employment": employment or [], "found": bool(employment), "fetched_at": now}
+    if not rows:
+        return
+
+    stmt = insert(HcrLookup).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[HcrLookup.registry_number],
+        set_={"employment": stmt.excluded.employment, "found": stmt.excluded.found, "fetched_at": stmt.excluded.fetched_at},
+    )
+    db.session.execute(stmt)
+
+
+def cached_lookup(registry_number, force=False, headless=True):
+    """Employment history for one registry number, served from the cache when
+    fresh. Returns (employment, from_cache); lookup errors are not cached."""
+    key = normalize_registry_number(registry_number)
+    if not force:
+        hit = get_cached([key])
+        if key in hit:
+            return hit[key], True
+
+    employment = lookup_current_employment(key, headless=headless)
+    store_results([(key, employment)])
+    db.session.commit()
+    return employment, False
+
+
+def is_force_refresh(req):
+    return (req.args.get("force") or "").lower() in {"1", "true"}
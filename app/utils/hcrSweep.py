@@ -0,0 +1,117 @@
+import os
+import queue
+import threading
+import time
+
+from app.utils.scrapper import RegistryBrowser
+
+HCR_SWEEP_CONCURRENCY = int(os.getenv("HCR_SWEEP_CONCURRENCY", "4"))
+HCR_SWEEP_RATE = float(os.getenv("HCR_SWEEP_RATE", "2"))  # lookups per second across all workers
+HCR_SWEEP_BATCH = int(os.getenv("HCR_SWEEP_BATCH", "50"))
+
+_DONE = object()
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _lookup_worker(jobs, results, limiter, headless):
+    browser = RegistryBrowser(headless=headless)
+    try:
+        while True:
+            item = jobs.get()
+            if item is _DONE:
+                return
+            key, registry_number = item
+            limiter.wait()
+            try:
+                results.put((key, registry_number, browser.lookup(registry_number), None))
+            except Exception as e:
+                results.put((key, registry_number, None, e))
+                # A failed page can leave the browser wedged; start over. The
+                # next lookup relaunches it.
+                _close_quietly(browser)
+    finally:
+        try:
+            _close_quietly(browser)
+        finally:
+            # The sweep waits for one _DONE per worker, so it must always be sent.
+            results.put(_DONE)
+
+
+def _close_quietly(browser):
+    try:
+        browser.close()
+    except Exception as e:
+        print(f"Closing registry browser failed: {e}")
+
+
+def sweep_registry_numbers(items, on_batch, concurrency=None, rate=None, batch_size=None, headless=True):
+    """Look up many registry numbers with a pool of long-lived browsers.
+
+    `items` is a list of (key, registry_number). Results are handed to
+    `on_batch` as lists of (key, registry_number, job_info, error) from the
+    calling thread, every `batch_size` results, so the caller can persist them
+    in one transaction. Work already handed to on_batch survives an interrupted
+    sweep; callers resume by sweeping whatever is still pending."""
+    concurrency = max(1, min(concurrency or HCR_SWEEP_CONCURRENCY, len(items) or 1))
+    batch_size = batch_size or HCR_SWEEP_BATCH
+    limiter = RateLimiter(HCR_SWEEP_RATE if rate is None else rate)
+
+    jobs = queue.Queue()
+    results = queue.Queue()
+    for item in items:
+        jobs.put(item)
+    for _ in range(concurrency):
+        jobs.put(_DONE)
+
+    workers = [
+        threading.Thread(target=_lookup_worker, args=(jobs, results, limiter, headless), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for t in workers:
+        t.start()
+
+    running = concurrency
+    batch = []
+    try:
+        while running:
+            res = results.get()
+            if res is _DONE:
+                running -= 1
+                continue
+            batch.append(res)
+            if len(batch) >= batch_size:
+                on_batch(batch)
+                batch = []
+        if batch:
+            on_batch(batch)
+    except BaseException:
+        # Stop handing out work; whatever was not persisted stays pending.
+        while True:
+            try:
+                jobs.get_nowait()
+            except queue.Empty:
+                break
+        for _ in range(concurrency):
+            jobs.put(_DONE)
+        raise
+
+    for t in workers:
+        t.join()
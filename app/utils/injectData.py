@@ -1,150 +1,298 @@
-from docx import Document
 from copy import deepcopy
 import json
 from pathlib import Path
 import os
+import hashlib
+import threading
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime
-from docx.shared import Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from app.utils.metrics import span
 
 TEMPLATE_PATH = os.getenv("TEMPLATE_PATH")
 templateArray =['Template Ledger.docx','Template Progress.docx','Template Transcript.docx','Template SAP.docx']
 cnaTemplateArray = ['CNA Template Ledger.docx', 'CNA Template Progress.docx', 'CNA Template Transcript.docx', 'CNA Template SAP.docx']
 CNA_LEDGER_TOTAL = 3150.0
 
-def _replace_across_runs(runs, key, value):
-    """Replace key→value even if the key is split across multiple runs.
-    Keeps the original run objects and their formatting."""
+# python-docx is imported where a document is opened, so processes that never
+# render don't load it; these are qn("w:p") / qn("w:t") spelled out.
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_P = W_NS + "p"
+W_T = W_NS + "t"
+
+class PlaceholderMatcher:
+    """Aho-Corasick automaton over all replacement keys, so a paragraph is
+    scanned once no matter how many keys there are. Overlaps resolve
+    leftmost-longest: "@zipcode" wins over "@zip", "@mge10" over "@mg1"."""
+
+    def __init__(self, keys):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for key in keys:
+            if key:
+                self._add(key)
+        self._build()
+
+    def _add(self, key):
+        node = 0
+        for ch in key:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(key)
+
+    def _build(self):
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for ch, nxt in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(ch, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+                queue.append(nxt)
+
+    def find(self, text):
+        """Non-overlapping (start, end, key) matches, leftmost-longest."""
+        found = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for key in self.out[node]:
+                found.append((i + 1 - len(key), i + 1, key))
+        if not found:
+            return found
+
+        found.sort(key=lambda m: (m[0], -m[1]))
+        chosen = []
+        cursor = 0
+        for start, end, key in found:
+            if start >= cursor:
+                chosen.append((start, end, key))
+                cursor = end
+        return chosen
+
+
+_matcher_cache = {}
+
+
+def _get_matcher(replacements):
+    keys = tuple(sorted(replacements))
+    matcher = _matcher_cache.get(keys)
+    if matcher is None:
+        if len(_matcher_cache) >= 64:
+            _matcher_cache.clear()
+        matcher = _matcher_cache[keys] = PlaceholderMatcher(keys)
+    return matcher
+
+
+def _replace_in_runs(runs, replacements, matcher):
+    """Replace every key in one pass over the paragraph text, even if a key is
+    split across runs. Text outside matches stays in its original run; each
+    value goes into the run where its key started, so it keeps that run's
+    formatting."""
     if not runs:
         return
 
-    # Build a full string and a map back to (run_idx, char_idx)
-    full = []
-    idx_map = []
-    for ri, r in enumerate(runs):
-        t = r.text or ""
-        full.append(t)
-        idx_map.extend([(ri, cj) for cj in range(len(t))])
-    s = "".join(full)
-    if not s or key not in s:
+    texts = [r.text or "" for r in runs]
+    s = "".join(texts)
+    if not s:
+        return
+    matches = matcher.find(s)
+    if not matches:
         return
 
-    new_s = s.replace(key, value)
-
-    # Clear all run texts (but keep the runs & formatting)
-    for r in runs:
-        r.text = ""
-
-    # Re-distribute new_s back into the original runs by their original lengths
-    # so formatting sticks to the same spans as much as possible.
-    # Count original lengths:
-    lens = []
-    start = 0
-    for ri, r in enumerate(runs):
-        # original length of this run was how many idx_map entries had run_idx==ri
-        orig_len = sum(1 for pair in idx_map if pair[0] == ri)
-        lens.append(orig_len)
-
-    pos = 0
-    for ri, r in enumerate(runs):
-        take = lens[ri]
-        if take == 0:
-            continue
-        chunk = new_s[pos:pos+take]
-        r.text = chunk
-        pos += len(chunk)
-        if pos >= len(new_s):
-            break
+    run_ends = []
+    total = 0
+    for t in texts:
+        total += len(t)
+        run_ends.append(total)
+
+    out = [[] for _ in runs]
+    ri = 0
+
+    def emit(a, b):
+        nonlocal ri
+        while a < b:
+            while run_ends[ri] <= a:
+                ri += 1
+            stop = min(b, run_ends[ri])
+            out[ri].append(s[a:stop])
+            a = stop
+
+    cursor = 0
+    for start, end, key in matches:
+        emit(cursor, start)
+        while run_ends[ri] <= start:
+            ri += 1
+        value = replacements[key]
+        out[ri].append("" if value is None else str(value))
+        cursor = end
+    emit(cursor, len(s))
+
+    for r, old, parts in zip(runs, texts, out):
+        new = "".join(parts)
+        if new != old:
+            r.text = new
+
+
+def _replace_in_paragraph(paragraph, replacements: dict, matcher=None):
+    _replace_in_runs(paragraph.runs, replacements, matcher or _get_matcher(replacements))
+
+
+def _replace_in_cell(cell, replacements: dict, matcher=None):
+    matcher = matcher or _get_matcher(replacements)
+    for p in cell.paragraphs:
+        _replace_in_paragraph(p, replacements, matcher)
+    # Recursively process nested tables too
+    for t in cell.tables:
+        for row in t.rows:
+            for c in row.cells:
+                _replace_in_cell(c, replacements, matcher)
 
-    # If replacement made the text longer than total original chars,
-    # append overflow to the last run to keep formatting.
-    if pos < len(new_s):
-        runs[-1].text += new_s[pos:]
+class CompiledTemplate:
+    """A template read, parsed and scanned once: the parsed document plus the
+    positions (in body paragraph order, tables and nested tables included) of
+    every paragraph that holds an @placeholder, even when it is split across runs.
 
+    Renders only ever touch the main document part, so new_document() copies
+    that part's XML and shares every other part (styles, numbering, media...)
+    with the parsed original instead of unzipping and parsing the package again."""
 
-def _replace_in_paragraph(paragraph, replacements: dict):
-    # First, handle simple same-run replacements to avoid heavy work
-    for run in paragraph.runs:
-        if not run.text:
-            continue
-        for k, v in replacements.items():
-            if k in run.text:
-                run.text = run.text.replace(k, v)
+    def __init__(self, path, mtime, data, document, slots):
+        self.path = path
+        self.mtime = mtime
+        self.digest = hashlib.sha256(data).hexdigest()
+        self.document = document
+        self.slots = slots
+        main = document.part
+        self._shared = {id(part): part for part in main.package.iter_parts() if part is not main}
 
-    # Then handle cases where placeholders are split across runs
-    for k, v in replacements.items():
-        _replace_across_runs(paragraph.runs, k, v)
+    def new_document(self):
+        return deepcopy(self.document, dict(self._shared))
 
 
-def _replace_in_cell(cell, replacements: dict):
-    for p in cell.paragraphs:
-        _replace_in_paragraph(p, replacements)
-    # Recursively process nested tables too
-    for t in cell.tables:
-        for row in t.rows:
-            for c in row.cells:
-                _replace_in_cell(c, replacements)
+_compiled_templates = {}
+_compile_lock = threading.Lock()
 
-def injectTemplate(replacements,type):
-    fullname = replacements["@firstName"]+replacements["@middleName"]+replacements["@lastName"]
-    print(f"======== creating template {type} for {fullname} =========")
-    doc = Document(TEMPLATE_PATH+"/"+templateArray[type])
 
-    # Replace in paragraphs
-    for p in doc.paragraphs:
-        _replace_in_paragraph(p, replacements)
+def _body_paragraphs(doc):
+    return list(doc.element.body.iter(W_P))
 
-    # Replace in cells
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                _replace_in_cell(cell, replacements)
 
-    if type == 0:
-        _fill_standard_ledger_table(doc, replacements)
+def _paragraph_text(p_el):
+    return "".join(t.text or "" for t in p_el.iter(W_T))
 
 
-    # Write to memory
+def _compile_template(path):
+    mtime = os.path.getmtime(path)
+    from docx import Document
+
+    with open(path, "rb") as f:
+        data = f.read()
+    doc = Document(BytesIO(data))
+    slots = [i for i, p_el in enumerate(_body_paragraphs(doc)) if "@" in _paragraph_text(p_el)]
+    return CompiledTemplate(path, mtime, data, doc, slots)
+
+
+def _get_compiled_template(path):
+    """Compiled template for `path`, recompiled when the file changes on disk."""
+    tpl = _compiled_templates.get(path)
+    if tpl and tpl.mtime == os.path.getmtime(path):
+        return tpl
+
+    with _compile_lock:
+        tpl = _compiled_templates.get(path)
+        if not tpl or tpl.mtime != os.path.getmtime(path):
+            tpl = _compile_template(path)
+            _compiled_templates[path] = tpl
+    return tpl
+
+
+def templateDigest(type, cna=False):
+    """Content hash of the template behind a generation type, used to key
+    caches of rendered output so they invalidate when a template changes."""
+    names = cnaTemplateArray if cna else templateArray
+    return _get_compiled_template(os.path.join(TEMPLATE_PATH, names[type])).digest
+
+
+def _render_compiled_template(path, replacements):
+    from docx.text.paragraph import Paragraph
+
+    tpl = _get_compiled_template(path)
+    doc = tpl.new_document()
+
+    # "__ledger_rows__" style entries feed the ledger tables, not the text.
+    text_keys = {k: v for k, v in replacements.items() if not k.startswith("__")}
+    matcher = _get_matcher(text_keys)
+    if not all(k.startswith("@") for k in text_keys):
+        # The fill plan only knows @placeholders; anything else needs a full walk.
+        for p_el in _body_paragraphs(doc):
+            _replace_in_paragraph(Paragraph(p_el, doc._body), text_keys, matcher)
+        return doc
+
+    paragraphs = _body_paragraphs(doc)
+    for i in tpl.slots:
+        _replace_in_paragraph(Paragraph(paragraphs[i], doc._body), text_keys, matcher)
+    return doc
+
+
+def _save_to_stream(doc):
     output_stream = BytesIO()
     doc.save(output_stream)
     output_stream.seek(0)
     return output_stream
 
 
+@span("docx_render")
+def injectTemplate(replacements,type):
+    fullname = replacements["@firstName"]+replacements["@middleName"]+replacements["@lastName"]
+    print(f"======== creating template {type} for {fullname} =========")
+    doc = _render_compiled_template(os.path.join(TEMPLATE_PATH, templateArray[type]), replacements)
+
+    if type == 0:
+        _fill_standard_ledger_table(doc, replacements)
+
+    # Write to memory
+    return _save_to_stream(doc)
+
+
+@span("docx_render")
 def injectCnaTemplate(replacements, type):
     fullname = replacements["@firstName"] + replacements["@middleName"] + replacements["@lastName"]
     print(f"======== creating CNA template {type} for {fullname} =========")
-    doc = Document(TEMPLATE_PATH + "/" + cnaTemplateArray[type])
-
-    for p in doc.paragraphs:
-        _replace_in_paragraph(p, replacements)
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                _replace_in_cell(cell, replacements)
+    doc = _render_compiled_template(os.path.join(TEMPLATE_PATH, cnaTemplateArray[type]), replacements)
 
     if type == 0:
         _fill_cna_ledger_table(doc, replacements)
 
-    output_stream = BytesIO()
-    doc.save(output_stream)
-    output_stream.seek(0)
-    return output_stream
+    return _save_to_stream(doc)
 
 
+@span("docx_render")
 def injectUploadedTemplate(replacements, file_stream):
+    from docx import Document
+
     file_bytes = file_stream.read()
     doc = Document(BytesIO(file_bytes))
+    matcher = _get_matcher(replacements)
 
     for p in doc.paragraphs:
-        _replace_in_paragraph(p, replacements)
+        _replace_in_paragraph(p, replacements, matcher)
 
     for table in doc.tables:
         for row in table.rows:
             for cell in row.cells:
-                _replace_in_cell(cell, replacements)
+                _replace_in_cell(cell, replacements, matcher)
 
     output_stream = BytesIO()
     doc.save(output_stream)
@@ -152,21 +300,10 @@ def injectUploadedTemplate(replacements, file_stream):
     return output_stream
 
 
+@span("docx_render")
 def injectLocalTemplate(replacements, template_name):
-    doc = Document(os.path.join(TEMPLATE_PATH, template_name))
-
-    for p in doc.paragraphs:
-        _replace_in_paragraph(p, replacements)
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                _replace_in_cell(cell, replacements)
-
-    output_stream = BytesIO()
-    doc.save(output_stream)
-    output_stream.seek(0)
-    return output_stream
+    doc = _render_compiled_template(os.path.join(TEMPLATE_PATH, template_name), replacements)
+    return _save_to_stream(doc)
 
 
 def _format_money(value):
@@ -236,6 +373,9 @@ def _ensure_cna_ledger_row_capacity(ledger_table, row_count):
 
 
 def _write_cna_ledger_cell(cell, value, bold=False):
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt
+
     paragraph = cell.paragraphs[0] if cell.paragraphs else cell.add_paragraph()
     paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
@@ -257,6 +397,7 @@ gradeDic = {
 }
 
 
+@lru_cache(maxsize=4096)
 def _parse_class_date(value):
     if not value:
         return None
@@ -341,34 +482,34 @@ def getCnaFinalGrade(studentModules):
 
 
 def getCnaFinalGradeSAP(studentModules, moduleDates, midpoint):
-    midpoint_date = _parse_class_date(midpoint)
-    if not midpoint_date:
-        return 0
-
-    completed_scores = []
-    for grade, module_date in zip(studentModules, moduleDates):
-        parsed_date = _parse_class_date(module_date)
-        if parsed_date and parsed_date <= midpoint_date and grade in gradeDic:
-            completed_scores.append(gradeDic[grade])
-
+    completed_scores = _get_scores_completed_by_midpoint(studentModules, moduleDates, midpoint)
     if not completed_scores:
         return 0
 
     return sum(completed_scores) / len(completed_scores)
 
 
-def _get_scores_completed_by_midpoint(grades, dates, midpoint):
+@lru_cache(maxsize=1024)
+def _completed_by_midpoint_mask(dates, midpoint):
+    """For a class's date list, which slots fall on or before the midpoint.
+    Cached, so every student and document of a class shares one parse."""
     midpoint_date = _parse_class_date(midpoint)
     if not midpoint_date:
-        return []
+        return None
 
-    completed_scores = []
-    for grade, item_date in zip(grades, dates):
+    mask = []
+    for item_date in dates:
         parsed_date = _parse_class_date(item_date)
-        if parsed_date and parsed_date <= midpoint_date and grade in gradeDic:
-            completed_scores.append(gradeDic[grade])
+        mask.append(bool(parsed_date and parsed_date <= midpoint_date))
+    return tuple(mask)
+
+
+def _get_scores_completed_by_midpoint(grades, dates, midpoint):
+    mask = _completed_by_midpoint_mask(tuple(dates), midpoint)
+    if mask is None:
+        return []
 
-    return completed_scores
+    return [gradeDic[grade] for grade, done in zip(grades, mask) if done and grade in gradeDic]
 
 
 def getFinalGradeSAP(studentModules, studentUnits, classType, moduleDates=None, unitDates=None, midpoint=None):
@@ -409,6 +550,53 @@ def getFinalGradeSAP(studentModules, studentUnits, classType, moduleDates=None,
     return 0
     
 
+class ClassGrading:
+    """A class's grading structure prepared once (padded date arrays and the
+    midpoint masks) and applied to many students, using the same slot rules
+    as the generateFiles/generateCnaFiles documents."""
+
+    def __init__(self, classObj, cna=False):
+        self.classType = classObj.classType
+        self.cna = cna
+        self.midpoint = classObj.midpoint
+        self.module_slots = 11 if cna else 12
+        module_dates = classObj.dateModules or []
+        unit_dates = classObj.dateUnits or []
+        self.moduleDates = module_dates[:self.module_slots] if len(module_dates) > 1 else [""] * self.module_slots
+        self.unitDates = [] if cna else (unit_dates[:8] if len(unit_dates) > 1 else [""] * 8)
+        # Warm the shared masks once for the whole class.
+        _completed_by_midpoint_mask(tuple(self.moduleDates), self.midpoint)
+        _completed_by_midpoint_mask(tuple(self.unitDates), self.midpoint)
+
+    def grade(self, modules, units):
+        modules = modules or []
+        units = units or []
+        moduleGrades = modules[:self.module_slots] if len(modules) > 1 else [""] * self.module_slots
+
+        if self.cna:
+            finalGrade = getCnaFinalGrade(moduleGrades)
+            finalGradeSAP = getCnaFinalGradeSAP(moduleGrades, self.moduleDates, self.midpoint)
+        else:
+            unitGrades = units[:8] if len(units) > 1 else [""] * 8
+            finalGrade = getFinalGrade(moduleGrades, unitGrades, self.classType)
+            finalGradeSAP = getFinalGradeSAP(
+                moduleGrades,
+                unitGrades,
+                self.classType,
+                moduleDates=self.moduleDates,
+                unitDates=self.unitDates,
+                midpoint=self.midpoint,
+            )
+
+        return {
+            "finalGrade": finalGrade,
+            "letterGrade": parseFinalGrade(finalGrade),
+            "gpa": getGPA(finalGrade),
+            "sapGrade": finalGradeSAP,
+            "sapGpa": getGPA(finalGradeSAP),
+        }
+
+
 def insertLedgerValues(replacements,student,classObj):
     receipt_dates = student.get("receiptDates") or []
     receipt_amounts = student.get("receiptAmounts") or []
@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models.job import ExtractionJob
+from app.utils.blobStore import blob_store
+from app.utils.metrics import span
+
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+# A running job whose heartbeat is older than this is taken to have lost its
+# worker; it is requeued, or failed once it has been tried JOB_MAX_ATTEMPTS times.
+JOB_STALE_MINUTES = int(os.getenv("JOB_STALE_MINUTES", "30"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# How often a running process looks for jobs orphaned by a crashed worker.
+JOB_REQUEUE_INTERVAL_SECONDS = float(os.getenv("JOB_REQUEUE_INTERVAL_SECONDS", "300"))
+
+# kind -> handler(job, pdf_bytes, progress) returning a JSON-serializable result
+_handlers = {}
+_wakeup = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+_next_requeue = 0.0
+_requeue_lock = threading.Lock()
+
+
+def register_handler(kind, handler):
+    _handlers[kind] = handler
+
+
+def is_async_request(req):
+    """Uploads opt into the queue with ?async=1 (or an `async` form field)."""
+    return (req.args.get("async") or req.form.get("async") or "").lower() in {"1", "true"}
+
+
+def submit_job(kind, pdf_bytes, filename, classId=None):
+    """Park the upload in the blob store and queue it; returns the job row."""
+    job = ExtractionJob(
+        kind=kind,
+        status="queued",
+        progress="queued",
+        filename=filename,
+        classId=classId,
+        sourceRef=blob_store.put(pdf_bytes),
+    )
+    db.session.add(job)
+    db.session.commit()
+    _wakeup.set()
+    return job
+
+
+def _claim_next_job():
+    # SKIP LOCKED lets workers in several processes share the table safely.
+    job = (
+        ExtractionJob.query
+        .filter_by(status="queued")
+        .order_by(ExtractionJob.id.asc())
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if not job:
+        db.session.rollback()
+        return None
+
+    job.status = "running"
+    job.progress = "starting"
+    job.started_at = job.heartbeat_at = datetime.utcnow()
+    job.attempts = (job.attempts or 0) + 1
+    db.session.commit()
+    return job.id
+
+
+def _set_progress(job_id, progress):
+    ExtractionJob.query.filter_by(id=job_id).update({"progress": progress, "heartbeat_at": datetime.utcnow()})
+    db.session.commit()
+
+
+def _heartbeat_loop(app, job_id, stop):
+    with app.app_context():
+        try:
+            while not stop.wait(JOB_HEARTBEAT_SECONDS):
+                try:
+                    ExtractionJob.query.filter_by(id=job_id, status="running").update(
+                        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+                    )
+                    db.session.commit()
+                except Exception as e:
+                    print(f"Heartbeat for job {job_id} failed: {e}")
+                    db.session.rollback()
+        finally:
+            db.session.remove()
+
+
+@contextmanager
+def _heartbeat(job_id):
+    """Keep heartbeat_at fresh while a handler is busy in one long step (an
+    LLM call on a large packet), so the job is not mistaken for orphaned."""
+    stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat_loop, args=(current_app._get_current_object(), job_id, stop),
+        name=f"job-heartbeat-{job_id}", daemon=True,
+    ).start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+def _run_job(job_id):
+    job = ExtractionJob.query.get(job_id)
+    handler = _handlers.get(job.kind)
+    try:
+        if not handler:
+            raise ValueError(f"No handler for job kind '{job.kind}'")
+        pdf_bytes = blob_store.get(job.sourceRef)
+        with span(f"job.{job.kind}"), _heartbeat(job_id):
+            result = handler(job, pdf_bytes, lambda p: _set_progress(job_id, p))
+        job = ExtractionJob.query.get(job_id)
+        job.status = "completed"
+        job.progress = "done"
+        job.result = result
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        traceback.print_exc()
+        db.session.rollback()
+        job = ExtractionJob.query.get(job_id)
+        job.status = "failed"
+        job.progress = "failed"
+        job.error = str(e)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def _requeue_stale_jobs():
+    now = datetime.utcnow()
+    stale = (
+        ExtractionJob.query
+        .filter(ExtractionJob.status == "running")
+        .filter(func.coalesce(ExtractionJob.heartbeat_at, ExtractionJob.started_at) < now - timedelta(minutes=JOB_STALE_MINUTES))
+    )
+    # A job that keeps taking its worker down is not retried forever.
+    failed = (
+        stale.filter(ExtractionJob.attempts >= JOB_MAX_ATTEMPTS)
+        .update(
+            {
+                "status": "failed",
+                "progress": "failed",
+                "error": f"Worker stopped responding {JOB_MAX_ATTEMPTS} times",
+                "finished_at": now,
+            },
+            synchronize_session=False,
+        )
+    )
+    requeued = stale.update({"status": "queued", "progress": "requeued"}, synchronize_session=False)
+    db.session.commit()
+    if requeued or failed:
+        print(f"Requeued {requeued} stale extraction jobs, gave up on {failed}")
+
+
+def _requeue_stale_jobs_if_due():
+    """Run the stale-job sweep at most once per JOB_REQUEUE_INTERVAL_SECONDS
+    across this process's workers."""
+    global _next_requeue
+    now = time.monotonic()
+    with _requeue_lock:
+        if now < _next_requeue:
+            return
+        _next_requeue = now + JOB_REQUEUE_INTERVAL_SECONDS
+    _requeue_stale_jobs()
+
+
+def _worker_loop(app, worker_no):
+    with app.app_context():
+        while True:
+            try:
+                _requeue_stale_jobs_if_due()
+                job_id = _claim_next_job()
+                if job_id is None:
+                    _wakeup.wait(JOB_POLL_SECONDS)
+                    _wakeup.clear()
+                    continue
+                print(f"Worker {worker_no} running job {job_id}")
+                _run_job(job_id)
+            except Exception as e:
+                print(f"Worker {worker_no} error: {e}")
+                db.session.rollback()
+                _wakeup.wait(JOB_POLL_SECONDS)
+            finally:
+                db.session.remove()
+
+
+def ensure_workers(app):
+    """Start the background worker threads once per process."""
+    global _started
+    if _started or EXTRACT_WORKERS <= 0:
+        return
+
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+        for n in range(EXTRACT_WORKERS):
+            t = threading.Thread(target=_worker_loop, args=(app, n + 1), name=f"extract-worker-{n + 1}", daemon=True)
+            t.start()
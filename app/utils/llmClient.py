@@ -0,0 +1,22 @@
+import os
+import threading
+
+from app.utils.startupTiming import timed
+
+OPENAI_API_KEY = os.getenv("OPEN_AI_KEY")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """The process-wide OpenAI client, created on first use. The SDK import
+    and the client's HTTP pool are only paid by workers that call the model."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                with timed("openai.client"):
+                    from openai import OpenAI
+                    _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
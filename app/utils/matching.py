@@ -0,0 +1,340 @@
+import os
+import re
+import unicodedata
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.extensions import db
+from app.models.matchingRun import MatchingRun
+from app.models.referral import Referral
+from app.models.scrap import Scrap
+from app.models.student import Student
+from app.utils.countCache import invalidate_counts
+from app.utils.hcrCache import normalize_registry_number
+
+MATCH_MIN_CONFIDENCE = float(os.getenv("MATCH_MIN_CONFIDENCE", "0.8"))
+# Blocks with more records than this (a very common name pair) are skipped;
+# their members still meet through their other keys.
+MATCH_MAX_BLOCK_SIZE = int(os.getenv("MATCH_MAX_BLOCK_SIZE", "200"))
+MATCH_WRITE_BATCH = 1000
+
+Record = namedtuple("Record", "id tokens dob registry row")
+
+
+def normalize_name_tokens(*parts):
+    """Lowercase, accent-free name tokens; initials and punctuation dropped."""
+    text = " ".join(p for p in parts if p)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return sorted({t for t in re.split(r"[^a-z]+", text) if len(t) > 1})
+
+
+def name_similarity(a, b):
+    """Token-set similarity of two token lists in [0, 1]: order-insensitive and
+    tolerant of a missing middle name or an OCR typo in one token."""
+    if not a or not b:
+        return 0.0
+    sa, sb = set(a), set(b)
+    common = " ".join(sorted(sa & sb))
+    rest_a = " ".join(sorted(sa - sb))
+    rest_b = " ".join(sorted(sb - sa))
+    full_a = (common + " " + rest_a).strip()
+    full_b = (common + " " + rest_b).strip()
+
+    best = SequenceMatcher(None, full_a, full_b).ratio()
+    if common:
+        best = max(
+            best,
+            SequenceMatcher(None, common, full_a).ratio(),
+            SequenceMatcher(None, common, full_b).ratio(),
+        )
+    return best
+
+
+def _block_keys(record):
+    if record.registry:
+        yield ("rn", record.registry)
+    if record.dob:
+        yield ("dob", record.dob)
+    if len(record.tokens) == 1:
+        yield ("nm", record.tokens[0])
+    for pair in combinations(record.tokens, 2):
+        yield ("nm",) + pair
+
+
+def _build_blocks(records):
+    blocks = defaultdict(list)
+    for i, record in enumerate(records):
+        for key in _block_keys(record):
+            blocks[key].append(i)
+    return blocks
+
+
+def _candidates(record, blocks):
+    found = set()
+    for key in _block_keys(record):
+        members = blocks.get(key, ())
+        if key[0] != "rn" and len(members) > MATCH_MAX_BLOCK_SIZE:
+            continue
+        found.update(members)
+    return found
+
+
+def score_pair(student, scrap):
+    """(match_type, confidence) for a Student/Scrap pair, or None below
+    MATCH_MIN_CONFIDENCE. A shared registry number wins; otherwise two
+    different birth dates rule the pair out."""
+    name = name_similarity(student.tokens, scrap.tokens)
+
+    if student.registry and student.registry == scrap.registry:
+        match_type, confidence = "REGISTRY", 0.8 + 0.2 * name
+    elif student.dob and scrap.dob and student.dob != scrap.dob:
+        return None
+    elif student.dob and scrap.dob:
+        match_type, confidence = "NAME_DOB", 0.5 + 0.5 * name
+    else:
+        match_type, confidence = "NAME", 0.85 * name
+
+    if confidence < MATCH_MIN_CONFIDENCE:
+        return None
+    return match_type, round(min(confidence, 1.0), 5)
+
+
+def _load_students():
+    rows = (
+        db.session.query(
+            Student.id, Student.firstName, Student.middleName, Student.lastName,
+            Student.dob, Student.dobOn, Student.registryNumber.label("registry"),
+            Student.address, Student.phone, Student.email, Student.updated_at,
+        )
+        .order_by(Student.id.asc())
+        .all()
+    )
+    return [
+        Record(r.id, tokens, r.dobOn, normalize_registry_number(r.registry), r)
+        for r in rows
+        for tokens in [normalize_name_tokens(r.firstName, r.middleName, r.lastName)]
+        if tokens
+    ]
+
+
+def _load_scraps():
+    rows = (
+        db.session.query(
+            Scrap.id, Scrap.fullName, Scrap.dobOn, Scrap.registryNumber,
+            Scrap.certifiedDate, Scrap.methodology, Scrap.certifiedDate2, Scrap.methodology2,
+            Scrap.updated_at,
+        )
+        .order_by(Scrap.id.asc())
+        .all()
+    )
+    return [
+        Record(r.id, tokens, r.dobOn, normalize_registry_number(r.registryNumber), r)
+        for r in rows
+        for tokens in [normalize_name_tokens(r.fullName)]
+        if tokens
+    ]
+
+
+def _changed(record, last_run, max_id_attr):
+    if last_run is None:
+        return True
+    max_id = getattr(last_run, max_id_attr) or 0
+    updated_at = record.row.updated_at
+    return record.id > max_id or (updated_at is not None and updated_at >= last_run.started_at)
+
+
+def find_matches(students, scraps, changed_students=None, changed_scraps=None):
+    """Scored pairs {(student_id, scrap_id): (student, scrap, match_type, confidence)}.
+
+    Each side is indexed by blocking key (registry number, DOB, every pair of
+    name tokens) and only records sharing a key are compared. With the
+    `changed_*` index sets only pairs touching a changed record are scored."""
+    if changed_students is None:
+        changed_students = range(len(students))
+    if changed_scraps is None:
+        changed_scraps = ()
+
+    pairs = set()
+    scrap_blocks = _build_blocks(scraps)
+    for i in changed_students:
+        pairs.update((i, j) for j in _candidates(students[i], scrap_blocks))
+    if changed_scraps:
+        student_blocks = _build_blocks(students)
+        for j in changed_scraps:
+            pairs.update((i, j) for i in _candidates(scraps[j], student_blocks))
+
+    matches = {}
+    for i, j in pairs:
+        scored = score_pair(students[i], scraps[j])
+        if scored:
+            matches[(students[i].id, scraps[j].id)] = (students[i], scraps[j]) + scored
+    return matches, len(pairs)
+
+
+def _split_address(address):
+    parts = [p.strip() for p in (address or "").split(",")]
+    while len(parts) < 4:
+        parts.append("")
+    return parts[0], parts[1], parts[2], parts[3]
+
+
+def _referral_values(student, scrap, match_type, confidence):
+    s, c = student.row, scrap.row
+    full_name = " ".join(p for p in (s.firstName, s.middleName, s.lastName) if p)
+    street, city, state, zip_code = _split_address(s.address)
+    return {
+        "student_id": student.id,
+        "scrap_id": scrap.id,
+        "student_full_name": full_name,
+        "scrap_full_name": c.fullName,
+        "fullName": full_name,
+        "dob": s.dob,
+        "street": street,
+        "city": city,
+        "state": state,
+        "zip_code": zip_code,
+        "phone": s.phone,
+        "email": s.email,
+        "graduationDate1": c.certifiedDate,
+        "methodology1": c.methodology,
+        "graduationDate2": c.certifiedDate2,
+        "methodology2": c.methodology2,
+        "registryNumber": c.registryNumber,
+        "match_confidence": confidence,
+        "match_type": match_type,
+    }
+
+
+# Score columns refreshed when a known pair is matched again.
+REFRESHED_COLUMNS = ("student_full_name", "scrap_full_name", "registryNumber", "match_confidence", "match_type")
+
+
+def write_referrals(matches):
+    """Upsert every pair on (student_id, scrap_id): new pairs are inserted as
+    PENDING, known ones get their score refreshed when it changed. Review
+    fields (decision_status, agency) are never touched, and overlapping runs
+    cannot insert a pair twice. The caller commits."""
+    now = datetime.utcnow()
+    rows = [
+        {**_referral_values(*match), "decision_status": "PENDING", "created_at": now, "updated_at": now}
+        for match in matches.values()
+    ]
+
+    inserted = updated = 0
+    for start in range(0, len(rows), MATCH_WRITE_BATCH):
+        stmt = pg_insert(Referral).values(rows[start:start + MATCH_WRITE_BATCH])
+        refreshed = [getattr(Referral, c) for c in REFRESHED_COLUMNS]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Referral.student_id, Referral.scrap_id],
+            set_={**{c: stmt.excluded[c] for c in REFRESHED_COLUMNS}, "updated_at": now},
+            # Unchanged pairs are left alone so their updated_at does not move.
+            where=tuple_(*refreshed).is_distinct_from(tuple_(*(stmt.excluded[c] for c in REFRESHED_COLUMNS))),
+        )
+        # created_at is only set on insert, so it tells the two cases apart.
+        for created_at in db.session.scalars(stmt.returning(Referral.created_at)):
+            if created_at == now:
+                inserted += 1
+            else:
+                updated += 1
+    return inserted, updated
+
+
+def remove_stale_referrals(matches, student_ids=None, scrap_ids=None):
+    """Delete PENDING referrals that no longer score a match. Only pairs
+    touching the rescored records are considered (None: every referral);
+    reviewed referrals are kept. The caller commits."""
+    query = db.session.query(Referral.id, Referral.student_id, Referral.scrap_id).filter(
+        Referral.decision_status == "PENDING"
+    )
+    if student_ids is None and scrap_ids is None:
+        candidates = query.all()
+    else:
+        candidates = []
+        for column, ids in ((Referral.student_id, sorted(student_ids or ())), (Referral.scrap_id, sorted(scrap_ids or ()))):
+            for start in range(0, len(ids), MATCH_WRITE_BATCH):
+                candidates.extend(query.filter(column.in_(ids[start:start + MATCH_WRITE_BATCH])).all())
+
+    stale = sorted({r.id for r in candidates if (r.student_id, r.scrap_id) not in matches})
+    for start in range(0, len(stale), MATCH_WRITE_BATCH):
+        (
+            db.session.query(Referral)
+            .filter(Referral.id.in_(stale[start:start + MATCH_WRITE_BATCH]))
+            .delete(synchronize_session=False)
+        )
+    return len(stale)
+
+
+def run_matching(mode="full"):
+    """Match students against scraps and store the results as referrals.
+
+    "incremental" rescores only students and scraps created or updated since
+    the last completed run (against every record of the other side) and falls
+    back to a full run when there is none."""
+    last_run = None
+    if mode == "incremental":
+        last_run = (
+            MatchingRun.query.filter_by(status="completed")
+            .order_by(MatchingRun.id.desc())
+            .first()
+        )
+        if last_run is None:
+            mode = "full"
+
+    run = MatchingRun(mode=mode, status="running", started_at=datetime.utcnow())
+    db.session.add(run)
+    db.session.commit()
+    run_id = run.id
+
+    try:
+        students = _load_students()
+        scraps = _load_scraps()
+
+        if mode == "incremental":
+            changed_students = [i for i, s in enumerate(students) if _changed(s, last_run, "max_student_id")]
+            changed_scraps = [j for j, c in enumerate(scraps) if _changed(c, last_run, "max_scrap_id")]
+        else:
+            changed_students, changed_scraps = None, None
+
+        matches, compared = find_matches(students, scraps, changed_students, changed_scraps)
+        inserted, updated = write_referrals(matches)
+        if changed_students is None:
+            removed = remove_stale_referrals(matches)
+        else:
+            removed = remove_stale_referrals(
+                matches,
+                student_ids={students[i].id for i in changed_students},
+                scrap_ids={scraps[j].id for j in changed_scraps},
+            )
+
+        run = MatchingRun.query.get(run_id)
+        run.status = "completed"
+        run.max_student_id = max((s.id for s in students), default=last_run.max_student_id if last_run else None)
+        run.max_scrap_id = max((c.id for c in scraps), default=last_run.max_scrap_id if last_run else None)
+        run.stats = {
+            "students": len(students) if changed_students is None else len(changed_students),
+            "scraps": len(scraps) if changed_scraps is None else len(changed_scraps),
+            "pairsCompared": compared,
+            "matches": len(matches),
+            "inserted": inserted,
+            "updated": updated,
+            "removed": removed,
+        }
+    except Exception as e:
+        db.session.rollback()
+        run = MatchingRun.query.get(run_id)
+        run.status = "failed"
+        run.stats = {"error": str(e)}
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    invalidate_counts("referrals")
+    return run
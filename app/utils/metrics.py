@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.startupTiming import startup_timings
+
+# Metrics live in this process only; with several gunicorn workers each one is
+# scraped separately. Renders done inside the render pool's child processes
+# are not seen here.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for labels, (counts, total, count) in items:
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {count}')
+            lines.append(f"{_series(self.name + '_sum', base)} {total:.6f}")
+            lines.append(f"{_series(self.name + '_count', base)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{_series(self.name, _labels(self.label_names, labels))} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    return "".join(f'{n}="{_escape(v)}",' for n, v in zip(names, values))
+
+
+def _series(name, labels):
+    return f"{name}{{{labels.rstrip(',')}}}" if labels else name
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint.", ("endpoint", "method"),
+)
+REQUESTS_TOTAL = Counter(
+    "http_requests_total", "Requests by endpoint and status.", ("endpoint", "method", "status"),
+)
+REQUEST_SQL_QUERIES = Histogram(
+    "http_request_sql_queries", "SQL statements executed per request.", ("endpoint",),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per request.", ("endpoint",),
+)
+SQL_SECONDS = Histogram(
+    "sql_query_duration_seconds", "Duration of every SQL statement, in or out of a request.", (),
+)
+SPAN_SECONDS = Histogram(
+    "span_duration_seconds", "Duration of instrumented steps (rasterize, llm, docx_render, registry_lookup...).",
+    ("span",),
+)
+
+_METRICS = (REQUEST_SECONDS, REQUESTS_TOTAL, REQUEST_SQL_QUERIES, REQUEST_SQL_SECONDS, SQL_SECONDS, SPAN_SECONDS)
+
+
+@contextmanager
+def span(name):
+    """Time a step into span_duration_seconds{span=name}; inside a request it
+    also shows up in that response's Server-Timing header."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe((name,), elapsed)
+        if has_request_context() and "metrics_spans" in g:
+            g.metrics_spans[name] = g.metrics_spans.get(name, 0.0) + elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    SQL_SECONDS.observe((), elapsed)
+    if has_request_context() and "metrics_sql_count" in g:
+        g.metrics_sql_count += 1
+        g.metrics_sql_seconds += elapsed
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute.
+    starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def render_metrics():
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    lines.append("# HELP app_startup_seconds Startup steps and first use of lazily loaded pieces.")
+    lines.append("# TYPE app_startup_seconds gauge")
+    for step, seconds in sorted(startup_timings().items()):
+        lines.append(f"{_series('app_startup_seconds', _labels(('step',), (step,)))} {seconds}")
+    return "\n".join(lines) + "\n"
+
+
+_listening = False
+_listening_lock = threading.Lock()
+
+
+def init_metrics(app):
+    """Time every request and count its SQL. Statement hooks are attached to
+    the Engine class once per process, so every engine is covered."""
+    global _listening
+    with _listening_lock:
+        if not _listening:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(Engine, "handle_error", _handle_error)
+            _listening = True
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_seconds = 0.0
+        g.metrics_spans = {}
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        # Streamed bodies (zip downloads) are timed up to their first byte.
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe((endpoint, request.method), elapsed)
+        REQUESTS_TOTAL.inc((endpoint, request.method, response.status_code))
+        REQUEST_SQL_QUERIES.observe((endpoint,), g.metrics_sql_count)
+        REQUEST_SQL_SECONDS.observe((endpoint,), g.metrics_sql_seconds)
+
+        timing = [
+            f"app;dur={elapsed * 1000:.1f}",
+            f'db;dur={g.metrics_sql_seconds * 1000:.1f};desc="{g.metrics_sql_count} queries"',
+        ]
+        timing += [f"{name};dur={secs * 1000:.1f}" for name, secs in g.metrics_spans.items()]
+        response.headers.add("Server-Timing", ", ".join(timing))
+        return response
@@ -1,13 +1,100 @@
-import base64, io
-from pdf2image import convert_from_bytes
+import base64, io, os, tempfile
+from app.utils.metrics import span
 
-def pdf_to_page_images(pdf_bytes: bytes, dpi, max_pages):
-    pages = convert_from_bytes(pdf_bytes, dpi=dpi)  # needs poppler
-    if max_pages: pages = pages[:max_pages]
-    data_urls = []
-    for im in pages:
+# The vision model fits images into 2048x2048 and then scales the short side
+# down to 768px, so anything larger is only extra bytes on the wire.
+VISION_MAX_LONG_SIDE = 2048
+VISION_MAX_SHORT_SIDE = 768
+
+# A page counts as colored when more than this share of pixels is saturated.
+COLOR_SATURATION_MIN = 40
+COLOR_PIXEL_RATIO = 0.005
+
+JPEG_QUALITY_COLOR = 80
+JPEG_QUALITY_GRAY = 70
+
+def _fit_to_vision(im):
+    w, h = im.size
+    scale = min(1.0, VISION_MAX_LONG_SIDE / max(w, h), VISION_MAX_SHORT_SIDE / min(w, h))
+    if scale >= 1.0:
+        return im
+    from PIL import Image
+    return im.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS)
+
+def _has_color(im):
+    sat = im.convert("HSV").getchannel("S")
+    hist = sat.histogram()
+    colored = sum(hist[COLOR_SATURATION_MIN:])
+    return colored > COLOR_PIXEL_RATIO * im.size[0] * im.size[1]
+
+def encode_page(im):
+    """Downsize a rendered page to the vision model's working size, drop color
+    when the page has none, and keep the smallest of the candidate encodings.
+
+    Returns (data_url, info) where info records the choice made for the page."""
+    im = _fit_to_vision(im.convert("RGB"))
+    color = _has_color(im)
+    if not color:
+        im = im.convert("L")
+
+    candidates = []
+    buf = io.BytesIO()
+    quality = JPEG_QUALITY_COLOR if color else JPEG_QUALITY_GRAY
+    im.save(buf, format="JPEG", quality=quality, optimize=True)
+    candidates.append(("jpeg", quality, buf.getvalue()))
+    if not color:
+        # Clean grayscale scans (forms, typed text) often compress better losslessly.
         buf = io.BytesIO()
-        im.save(buf, format="JPEG", quality=80)
-        b64 = base64.b64encode(buf.getvalue()).decode("utf-8")
-        data_urls.append(f"data:image/jpeg;base64,{b64}")
-    return data_urls
\ No newline at end of file
+        im.save(buf, format="PNG", optimize=True)
+        candidates.append(("png", None, buf.getvalue()))
+
+    fmt, quality, data = min(candidates, key=lambda c: len(c[2]))
+    b64 = base64.b64encode(data).decode("utf-8")
+    info = {
+        "width": im.size[0],
+        "height": im.size[1],
+        "mode": "color" if color else "gray",
+        "format": fmt,
+        "quality": quality,
+        "bytes": len(data),
+    }
+    return f"data:image/{fmt};base64,{b64}", info
+
+def iter_page_images(pdf_bytes: bytes, dpi, max_pages, encodings=None):
+    """Rasterize one page at a time and yield it as an encoded data URL.
+
+    The PDF is spooled to a temp file once, then poppler is asked for a single
+    page per call, so only one decoded page is held in memory at a time and
+    pages past max_pages are never rendered. If `encodings` is a list, the
+    per-page encoding info from encode_page is appended to it."""
+    from pdf2image import convert_from_path, pdfinfo_from_path
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(pdf_bytes)
+
+        page_count = pdfinfo_from_path(path)["Pages"]  # needs poppler
+        if max_pages: page_count = min(page_count, max_pages)
+
+        for page_no in range(1, page_count + 1):
+            with span("rasterize"):
+                pages = convert_from_path(path, dpi=dpi, first_page=page_no, last_page=page_no)
+                if not pages:
+                    continue
+                im = pages[0]
+                data_url, info = encode_page(im)
+                im.close()
+            if encodings is not None:
+                encodings.append(dict(info, page=page_no))
+            yield data_url
+    finally:
+        os.remove(path)
+
+def pdf_to_page_images(pdf_bytes: bytes, dpi, max_pages):
+    return list(iter_page_images(pdf_bytes, dpi, max_pages))
+
+def summarize_encodings(encodings):
+    total = sum(e["bytes"] for e in encodings)
+    kinds = ", ".join(f"p{e['page']}:{e['mode']}/{e['format']}" for e in encodings)
+    return f"{len(encodings)} pages, {total // 1024} KB ({kinds})"
@@ -0,0 +1,68 @@
+from sqlalchemy import inspect
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_selectable_fields = {}
+
+
+def wants_page(args):
+    """List endpoints keep returning a plain array unless the caller asks for
+    a page with ?limit= or ?cursor=."""
+    return "limit" in args or "cursor" in args
+
+
+def _project(item, fields):
+    return {k: item[k] for k in fields if k in item}
+
+
+def _fields_for(model, serialize):
+    """Keys `serialize` exposes that are plain columns of `model`, so ?fields=
+    can never select a column (payload...) the serializer hides."""
+    fields = _selectable_fields.get(model)
+    if fields is None:
+        columns = set(inspect(model).column_attrs.keys())
+        fields = _selectable_fields[model] = {k for k in serialize(model()) if k in columns}
+    return fields
+
+
+def keyset_page(query, model, args, serialize):
+    """One page of `query` ordered by id, starting after ?cursor=<last id>.
+
+    ?limit= is capped at MAX_PAGE_SIZE, ?fields=a,b selects only those
+    columns in the query (id is always kept), and ?count=1 adds the total of the filtered
+    query, which is otherwise skipped because it costs a full scan."""
+    limit = args.get("limit", DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE
+    limit = max(min(limit, MAX_PAGE_SIZE), 1)
+    cursor = args.get("cursor", type=int)
+    fields = [f.strip() for f in (args.get("fields") or "").split(",") if f.strip()]
+    if fields:
+        allowed = _fields_for(model, serialize)
+        fields = ["id"] + [f for f in dict.fromkeys(fields) if f in allowed and f != "id"]
+
+    page = {}
+    if (args.get("count") or "").lower() in {"1", "true"}:
+        page["total"] = query.order_by(None).count()
+
+    if cursor:
+        query = query.filter(model.id > cursor)
+    if fields:
+        # Select only the requested columns; each row is serialized through a
+        # transient instance so formatting matches the full item.
+        query = query.with_entities(*(getattr(model, f) for f in fields))
+    rows = query.order_by(None).order_by(model.id.asc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if fields:
+        items = [_project(serialize(model(**r._asdict())), fields) for r in rows]
+    else:
+        items = [serialize(r) for r in rows]
+
+    page.update({
+        "items": items,
+        "limit": limit,
+        "hasMore": has_more,
+        "nextCursor": rows[-1].id if has_more else None,
+    })
+    return page
@@ -0,0 +1,205 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from app.utils.diskCache import DiskEvictor, write_atomic
+
+SOFFICE_BIN = os.getenv("SOFFICE_BIN", "soffice")
+# soffice processes per process that converts. Render-pool children (which
+# handle one document at a time) are set to 1 by renderPool, so an app worker
+# runs at most PDF_CONVERTER_WORKERS + DOC_RENDER_WORKERS converters.
+PDF_CONVERTER_WORKERS = int(os.getenv("PDF_CONVERTER_WORKERS", "2"))
+PDF_CONVERTER_START_TIMEOUT = 30
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(".cache", "pdf"))
+PDF_CACHE_ENTRIES = int(os.getenv("PDF_CACHE_ENTRIES", "2000"))
+
+
+class PdfConversionError(Exception):
+    pass
+
+
+def _prop(name, value):
+    from com.sun.star.beans import PropertyValue
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+class _SofficeWorker:
+    """One headless LibreOffice kept running and driven over UNO, so the
+    converter's startup is paid once per worker rather than per document.
+    Each worker has its own profile directory and pipe name, so several
+    workers (and several app processes) never share an instance."""
+
+    def __init__(self, index):
+        self.pipe_name = f"textinjector-{os.getpid()}-{index}"
+        self.profile_dir = tempfile.mkdtemp(prefix=f"soffice-{index}-")
+        self.proc = None
+        self.desktop = None
+
+    def start(self):
+        import uno
+
+        self.proc = subprocess.Popen(
+            [
+                SOFFICE_BIN, "--headless", "--invisible", "--nologo", "--norestore",
+                "--nodefault", "--nolockcheck",
+                f"-env:UserInstallation={uno.systemPathToFileUrl(self.profile_dir)}",
+                f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + PDF_CONVERTER_START_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.proc.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise PdfConversionError("LibreOffice did not start")
+                time.sleep(0.25)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def stop(self):
+        self.desktop = None
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+
+    def convert(self, docx_bytes):
+        import uno
+
+        if not self.desktop or not self.proc or self.proc.poll() is not None:
+            self.stop()
+            self.start()
+
+        workdir = tempfile.mkdtemp(prefix="docx2pdf-")
+        try:
+            in_path = os.path.join(workdir, "in.docx")
+            out_path = os.path.join(workdir, "out.pdf")
+            with open(in_path, "wb") as f:
+                f.write(docx_bytes)
+
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(in_path), "_blank", 0, (_prop("Hidden", True),)
+            )
+            if doc is None:
+                raise PdfConversionError("LibreOffice could not open the document")
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(out_path), (_prop("FilterName", "writer_pdf_Export"),))
+            finally:
+                doc.close(True)
+
+            with open(out_path, "rb") as f:
+                return f.read()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+_workers = None
+_all_workers = []
+_workers_lock = threading.Lock()
+
+
+def _get_workers():
+    global _workers
+    if _workers is None:
+        with _workers_lock:
+            if _workers is None:
+                # LIFO so a lightly loaded process keeps reusing one warm instance.
+                q = queue.LifoQueue()
+                for i in range(max(1, PDF_CONVERTER_WORKERS)):
+                    worker = _SofficeWorker(i)
+                    _all_workers.append(worker)
+                    q.put(worker)
+                _workers = q
+    return _workers
+
+
+@atexit.register
+def _shutdown_workers():
+    for worker in _all_workers:
+        worker.close()
+
+
+def convert_docx_to_pdf(docx_bytes):
+    """Convert with the next free warm worker; a failed worker is restarted
+    on its next use."""
+    workers = _get_workers()
+    worker = workers.get()
+    try:
+        return worker.convert(docx_bytes)
+    except Exception:
+        worker.stop()
+        raise
+    finally:
+        workers.put(worker)
+
+
+# ----- Output cache -----
+
+def pdf_cache_key(template_digest, replacements):
+    h = hashlib.sha256()
+    h.update(template_digest.encode("utf-8"))
+    h.update(json.dumps(replacements, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(PDF_CACHE_DIR, key[:2], key + ".pdf")
+
+
+def get_cached_pdf(key):
+    path = _cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+        return data
+    except OSError:
+        return None
+
+
+_cache_evictor = DiskEvictor(PDF_CACHE_DIR, ".pdf", PDF_CACHE_ENTRIES)
+
+
+def store_cached_pdf(key, data):
+    try:
+        write_atomic(_cache_path(key), data)
+        _cache_evictor.wrote()
+    except OSError as e:
+        print(f"PDF cache write failed: {e}")
+
+
+def render_pdf(template_digest, replacements, render_docx):
+    """PDF for a template + replacements, from the cache when the same
+    template version was already rendered with the same values.
+    `render_docx` is only called on a miss."""
+    key = pdf_cache_key(template_digest, replacements)
+    data = get_cached_pdf(key)
+    if data is not None:
+        return data
+    data = convert_docx_to_pdf(render_docx())
+    store_cached_pdf(key, data)
+    return data
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from app.utils.injectData import injectTemplate, injectCnaTemplate, templateDigest
+from app.utils import pdfRender
+from app.utils.pdfRender import render_pdf
+
+DOC_RENDER_WORKERS = int(os.getenv("DOC_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_render_child():
+    # A child renders one document at a time, so one warm converter is enough.
+    pdfRender.PDF_CONVERTER_WORKERS = 1
+
+
+def get_render_pool():
+    """Process pool shared by all requests in this worker. Spawned rather than
+    forked so children never inherit DB connections or job-queue threads, and
+    long-lived so each child keeps its compiled templates warm."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                ctx = multiprocessing.get_context("spawn")
+                _pool = ProcessPoolExecutor(
+                    max_workers=DOC_RENDER_WORKERS, mp_context=ctx, initializer=_init_render_child,
+                )
+    return _pool
+
+
+def _discard_broken_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_docx(replacements, type, cna=False):
+    stream = injectCnaTemplate(replacements, type) if cna else injectTemplate(replacements, type)
+    return stream.getvalue()
+
+
+def render_document(replacements, type, cna=False, pdf=False):
+    """Render one template to .docx (or cached/converted .pdf) bytes; runs
+    inside a pool process, each of which keeps its own warm converter."""
+    if pdf:
+        return render_pdf(templateDigest(type, cna), replacements, lambda: render_docx(replacements, type, cna))
+    return render_docx(replacements, type, cna)
+
+
+class _ZipStream:
+    """Write-only sink for zipfile: no seek(), so entries are written with data
+    descriptors and each finished entry can be flushed to the client."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_rendered_zip(jobs, errors=None):
+    """Render [(archive_name, replacements, type, cna, pdf)] in the pool and yield
+    zip bytes as each document completes. `errors` are written to errors.txt."""
+    pool = get_render_pool()
+    futures = {pool.submit(render_document, replacements, type, cna, pdf): name for name, replacements, type, cna, pdf in jobs}
+
+    sink = _ZipStream()
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    zf.writestr(name, future.result())
+                except BrokenProcessPool as e:
+                    # A crashed child poisons the executor; the next request gets a fresh one.
+                    _discard_broken_pool(pool)
+                    print(f"Render failed for {name}: {e}")
+                    zf.writestr(name + ".error.txt", str(e))
+                except Exception as e:
+                    print(f"Render failed for {name}: {e}")
+                    zf.writestr(name + ".error.txt", str(e))
+                yield sink.drain()
+            if errors:
+                zf.writestr("errors.txt", "\n".join(errors))
+        yield sink.drain()
+    finally:
+        # The client may go away mid-download (the generator is closed); do
+        # not leave the rest of the class rendering for nobody.
+        for future in futures:
+            future.cancel()
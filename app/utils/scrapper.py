@@ -1,17 +1,32 @@
+import os
 import re
 import json
+import threading
 from typing import List, Dict, Optional
+from urllib.parse import urljoin
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from app.utils.metrics import span
 
-HOME_URL = "https://apps.health.ny.gov/professionals/home_care/registry/home.action"
+HOME_URL = os.getenv("HCR_HOME_URL", "https://apps.health.ny.gov/professionals/home_care/registry/home.action")
+
+# "http" tries plain form posts first and falls back to Playwright; "browser" always drives Chromium.
+HCR_LOOKUP_BACKEND = os.getenv("HCR_LOOKUP_BACKEND", "http")
+HTTP_TIMEOUT = 30
+HTTP_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
 
 REGISTRY_INPUT_SEL = "#registry_number"
 SEARCH_BTN_SEL = "#submit_number_search"
 
 RESULT_NAME_BTN_SEL = "button.linkbutton[name^='resinums[']"
 EMPLOYMENT_BTN_SEL = "button#empl[name='action:employment']"
+EMPLOYMENT_TABLE_SEL = "table.light_table.profile_table"
+
+# Pages the HTTP flow must land on; anything else (a challenge page, an error
+# page, a redesigned site) is a failure, never "no employment".
+SEARCH_RESULTS_URL = re.compile(r"/searchworker\.action")
+WORKER_URL = re.compile(r"/worker\.action")
+NO_MATCH_TEXT = re.compile(r"no\s+(?:matching\s+)?(?:records?|results?|matches|workers?|individuals?)\s+(?:were\s+)?found", re.I)
+EMPLOYMENT_HEADING_TEXT = re.compile(r"employment\s+history", re.I)
 
 def _clean(s: Optional[str]) -> str:
     if not s:
@@ -23,9 +38,13 @@ def _parse_all_employment_history(html: str) -> List[Dict[str, str]]:
     Returns ALL rows in Employment History as:
       [{"agency": "...", "startDate": "..."}, ...]
     """
-    soup = BeautifulSoup(html, "lxml")
+    from bs4 import BeautifulSoup
+
+    return _parse_employment_table(BeautifulSoup(html, "lxml"))
+
 
-    table = soup.select_one("table.light_table.profile_table")
+def _parse_employment_table(soup) -> List[Dict[str, str]]:
+    table = soup.select_one(EMPLOYMENT_TABLE_SEL)
     if not table:
         return []
 
@@ -60,44 +79,254 @@ def _parse_all_employment_history(html: str) -> List[Dict[str, str]]:
         })
 
     return out
-def lookup_current_employment(registry_number: str, headless: bool = True) -> List[Dict[str, str]]:
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless)
-        page = browser.new_page()
-        page.set_default_timeout(30000)
+def _lookup_on_page(page, registry_number: str) -> List[Dict[str, str]]:
+    # 1) Home page
+    page.goto(HOME_URL, wait_until="domcontentloaded")
+    page.locator(REGISTRY_INPUT_SEL).fill(registry_number)
+    page.locator(SEARCH_BTN_SEL).click()
 
-        # 1) Home page
-        page.goto(HOME_URL, wait_until="domcontentloaded")
-        page.locator(REGISTRY_INPUT_SEL).fill(registry_number)
-        page.locator(SEARCH_BTN_SEL).click()
+    # 2) Search results page
+    page.wait_for_url(re.compile(r".*/searchworker\.action.*"), timeout=30000)
+    page.wait_for_load_state("domcontentloaded")
 
-        # 2) Search results page
-        page.wait_for_url(re.compile(r".*/searchworker\.action.*"), timeout=30000)
-        page.wait_for_load_state("domcontentloaded")
+    # Click caregiver name button (exact)
+    btn = page.locator(RESULT_NAME_BTN_SEL)
+    if btn.count() == 0:
+        return []
+    btn.first.click()
 
-        # Click caregiver name button (exact)
-        btn = page.locator(RESULT_NAME_BTN_SEL)
-        if btn.count() == 0:
-            browser.close()
+    # 3) Profile page
+    page.wait_for_url(re.compile(r".*/worker\.action.*"), timeout=30000)
+    page.wait_for_load_state("domcontentloaded")
+
+    # Click Employment History (exact)
+    empl = page.locator(EMPLOYMENT_BTN_SEL)
+    if empl.count() == 0:
+        return []
+    empl.click()
+
+    page.wait_for_load_state("domcontentloaded")
+    page.wait_for_timeout(200)
+
+    return _parse_all_employment_history(page.content())
+
+
+class RegistryHttpError(Exception):
+    """The plain HTTP flow could not follow the registry pages, or one of
+    its requests failed."""
+
+
+_http_local = threading.local()
+
+
+def _http_session() -> "requests.Session":
+    # One pooled session per thread; requests.Session is not thread-safe.
+    session = getattr(_http_local, "session", None)
+    if session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["User-Agent"] = HTTP_USER_AGENT
+        _http_local.session = session
+    return session
+
+
+def _form_fields(form) -> Dict[str, str]:
+    """Successful controls of a form, as the browser would submit them
+    (buttons excluded; the clicked one is added by the caller)."""
+    fields = {}
+    for el in form.find_all(["input", "select", "textarea"]):
+        name = el.get("name")
+        if not name or el.has_attr("disabled"):
+            continue
+        if el.name == "input":
+            kind = (el.get("type") or "text").lower()
+            if kind in {"submit", "button", "image", "reset", "file"}:
+                continue
+            if kind in {"checkbox", "radio"} and not el.has_attr("checked"):
+                continue
+            fields[name] = el.get("value", "on" if kind in {"checkbox", "radio"} else "")
+        elif el.name == "select":
+            opt = el.find("option", selected=True) or el.find("option")
+            fields[name] = opt.get("value", opt.get_text()) if opt else ""
+        else:
+            fields[name] = el.get_text()
+    return fields
+
+
+def _submit_button(session, page_url: str, soup, selector: str, overrides: Optional[Dict[str, str]] = None):
+    """Emulate clicking the button matched by `selector`: post its form with
+    the button's own name/value. Returns (url, soup) of the next page, or None
+    when the page has no such button."""
+    from bs4 import BeautifulSoup
+
+    button = soup.select_one(selector)
+    if not button:
+        return None
+    form = button.find_parent("form")
+    if not form:
+        raise RegistryHttpError(f"Button {selector} is not inside a form")
+
+    data = _form_fields(form)
+    if overrides:
+        data.update(overrides)
+    if button.get("name"):
+        data[button["name"]] = button.get("value", "")
+
+    action = urljoin(page_url, button.get("formaction") or form.get("action") or page_url)
+    method = (button.get("formmethod") or form.get("method") or "get").lower()
+    if method == "post":
+        resp = session.post(action, data=data, timeout=HTTP_TIMEOUT)
+    else:
+        resp = session.get(action, params=data, timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+    return resp.url, BeautifulSoup(resp.text, "lxml")
+
+
+def _expect_page(step, url_pattern, what):
+    """The (url, soup) of a step, or RegistryHttpError when the post did not
+    land on the expected registry page."""
+    url, soup = step
+    if not url_pattern.search(url):
+        raise RegistryHttpError(f"Expected the {what} page, got {url}")
+    return url, soup
+
+
+def lookup_current_employment_http(registry_number: str, home_url: str = None) -> List[Dict[str, str]]:
+    """Same search -> worker -> employment flow as the browser, done with plain
+    form posts over a pooled session. Returns [] only when the results page
+    says nothing matched; any page that does not look like the expected step,
+    and any failed request, raises RegistryHttpError so the caller can fall
+    back to the browser."""
+    import requests
+
+    try:
+        return _lookup_http(registry_number, home_url)
+    except requests.RequestException as e:
+        raise RegistryHttpError(f"Registry request failed: {e}") from e
+
+
+def _lookup_http(registry_number: str, home_url: str = None) -> List[Dict[str, str]]:
+    from bs4 import BeautifulSoup
+
+    session = _http_session()
+    session.cookies.clear()  # no Struts state carried over between numbers
+
+    home_url = home_url or HOME_URL
+    resp = session.get(home_url, timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+
+    soup = BeautifulSoup(resp.text, "lxml")
+    registry_input = soup.select_one(REGISTRY_INPUT_SEL)
+    if not registry_input or not registry_input.get("name"):
+        raise RegistryHttpError("Registry search form not found")
+
+    # 1) Search
+    step = _submit_button(session, resp.url, soup, SEARCH_BTN_SEL, {registry_input["name"]: registry_number})
+    if step is None:
+        raise RegistryHttpError("Registry search button not found")
+
+    # 2) Search results -> caregiver profile
+    url, soup = _expect_page(step, SEARCH_RESULTS_URL, "search results")
+    step = _submit_button(session, url, soup, RESULT_NAME_BTN_SEL)
+    if step is None:
+        if NO_MATCH_TEXT.search(soup.get_text(" ", strip=True)):
             return []
-        btn.first.click()
+        raise RegistryHttpError("Search results page has neither results nor a no-match message")
 
-        # 3) Profile page
-        page.wait_for_url(re.compile(r".*/worker\.action.*"), timeout=30000)
-        page.wait_for_load_state("domcontentloaded")
+    # 3) Profile -> employment history
+    url, soup = _expect_page(step, WORKER_URL, "worker profile")
+    step = _submit_button(session, url, soup, EMPLOYMENT_BTN_SEL)
+    if step is None:
+        raise RegistryHttpError("Employment history button not found on the worker profile")
 
-        # Click Employment History (exact)
-        empl = page.locator(EMPLOYMENT_BTN_SEL)
-        if empl.count() == 0:
+    url, soup = _expect_page(step, WORKER_URL, "employment history")
+    if not soup.select_one(EMPLOYMENT_TABLE_SEL) and not EMPLOYMENT_HEADING_TEXT.search(soup.get_text(" ", strip=True)):
+        raise RegistryHttpError("Employment history page not recognized")
+    return _parse_employment_table(soup)
+
+
+def lookup_current_employment(registry_number: str, headless: bool = True) -> List[Dict[str, str]]:
+    with span("registry_lookup"):
+        if HCR_LOOKUP_BACKEND == "http":
+            try:
+                return lookup_current_employment_http(registry_number)
+            except RegistryHttpError as e:
+                print(f"HTTP registry lookup failed for {registry_number}, falling back to browser: {e}")
+        return lookup_current_employment_browser(registry_number, headless=headless)
+
+
+def lookup_current_employment_browser(registry_number: str, headless: bool = True) -> List[Dict[str, str]]:
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)
+        try:
+            page = browser.new_page()
+            page.set_default_timeout(30000)
+            return _lookup_on_page(page, registry_number)
+        finally:
             browser.close()
-            return []
-        empl.click()
 
-        page.wait_for_load_state("domcontentloaded")
-        page.wait_for_timeout(200)
 
-        html = page.content()
-        browser.close()
+class RegistryBrowser:
+    """A long-lived Chromium owned by one thread (the sync Playwright API is not
+    thread-safe). Each lookup gets a fresh context so cookies and form state
+    never leak between registry numbers, and the browser itself is relaunched
+    after `max_uses` lookups to keep memory in check."""
+
+    def __init__(self, headless: bool = True, max_uses: int = 200):
+        self.headless = headless
+        self.max_uses = max_uses
+        self._playwright = None
+        self._browser = None
+        self._uses = 0
+
+    def _ensure_browser(self):
+        if self._browser and self._uses < self.max_uses:
+            return
+        if self._browser:
+            self._browser.close()
+        if not self._playwright:
+            from playwright.sync_api import sync_playwright
+            self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=self.headless)
+        self._uses = 0
+
+    def lookup(self, registry_number: str) -> List[Dict[str, str]]:
+        with span("registry_lookup"):
+            return self._lookup(registry_number)
+
+    def _lookup(self, registry_number: str) -> List[Dict[str, str]]:
+        if HCR_LOOKUP_BACKEND == "http":
+            try:
+                return lookup_current_employment_http(registry_number)
+            except RegistryHttpError as e:
+                print(f"HTTP registry lookup failed for {registry_number}, falling back to browser: {e}")
 
-    return _parse_all_employment_history(html)
+        # Chromium is only launched once a lookup actually needs it.
+        self._ensure_browser()
+        self._uses += 1
+        context = self._browser.new_context()
+        try:
+            page = context.new_page()
+            page.set_default_timeout(30000)
+            return _lookup_on_page(page, registry_number)
+        finally:
+            context.close()
 
+    def close(self):
+        # Forget the handles even when closing fails, so the next lookup
+        # launches a fresh browser instead of reusing a dead one.
+        browser, self._browser = self._browser, None
+        pw, self._playwright = self._playwright, None
+        try:
+            if browser:
+                browser.close()
+        finally:
+            if pw:
+                pw.stop()
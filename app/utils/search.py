@@ -0,0 +1,75 @@
+import os
+
+from sqlalchemy import func, literal, literal_column, or_, text
+from sqlalchemy.orm import defer
+
+from app.extensions import db
+from app.models.caregiver import Caregiver
+from app.models.referral import Referral
+from app.models.scrap import Scrap
+from app.models.student import Student
+
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+# word_similarity cut-off for the `<%` operator; pg_trgm's own default is 0.6,
+# which drops most OCR misspellings of short names.
+SEARCH_MIN_SCORE = float(os.getenv("SEARCH_MIN_SCORE", "0.4"))
+
+
+def student_full_name():
+    # Must stay textually identical to the ix_students_full_name_trgm index
+    # expression, hence the inline ' ' rather than a bound parameter.
+    space = literal_column("' '")
+    return Student.firstName + space + Student.middleName + space + Student.lastName
+
+
+# entity -> (model, name expressions backed by a trigram index, query options)
+SEARCH_ENTITIES = {
+    "students": (
+        Student,
+        lambda: [student_full_name()],
+        [defer(Student.payload)],
+    ),
+    "scraps": (Scrap, lambda: [Scrap.fullName], []),
+    "caregivers": (Caregiver, lambda: [Caregiver.full_name], []),
+    "referrals": (
+        Referral,
+        lambda: [Referral.fullName, Referral.student_full_name, Referral.scrap_full_name],
+        [],
+    ),
+}
+
+
+def set_search_threshold():
+    """Applies SEARCH_MIN_SCORE for the rest of the current transaction."""
+    db.session.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+        {"t": str(SEARCH_MIN_SCORE)},
+    )
+
+
+def ranked_name_matches(entity, term, limit=SEARCH_DEFAULT_LIMIT):
+    """Top `limit` rows of `entity` whose name looks like `term`, best first,
+    as a list of (row, score).
+
+    A row matches when `term` is a word-similar part of one of its name
+    columns (tolerates OCR typos) or a plain substring of it; both conditions
+    are served by the pg_trgm GIN indexes."""
+    model, names, options = SEARCH_ENTITIES[entity]
+    names = names()
+    term_lit = literal(term)
+    pattern = f"%{term}%"
+
+    scores = [func.word_similarity(term_lit, func.coalesce(name, "")) for name in names]
+    score = scores[0] if len(scores) == 1 else func.greatest(*scores)
+    condition = or_(*[term_lit.op("<%")(name) for name in names], *[name.ilike(pattern) for name in names])
+
+    rows = (
+        db.session.query(model, score.label("score"))
+        .options(*options)
+        .filter(condition)
+        .order_by(score.desc(), model.id.asc())
+        .limit(limit)
+        .all()
+    )
+    return [(row, round(float(s or 0), 4)) for row, s in rows]
@@ -0,0 +1,27 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_timings = {}
+_lock = threading.Lock()
+
+
+def record(name, seconds):
+    with _lock:
+        _timings[name] = round(seconds, 4)
+
+
+@contextmanager
+def timed(name):
+    """Record how long the block took under `name` (import, client setup...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def startup_timings():
+    """{name: seconds} for app startup and the first use of lazily loaded pieces."""
+    with _lock:
+        return dict(_timings)
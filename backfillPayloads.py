@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+One-off backfill: move legacy `students.payload` contents into the blob store.
+
+Older rows stored str(content_parts) in `payload` — the schema prompt plus
+every page as a base64 data URL. This script writes that text to the blob
+store, points `sourceRef` at it and empties `payload`, in batches by id so
+memory stays bounded. A registry number found in the payload is copied to
+`registryNumber` first.
+
+Usage:
+    APP_ENV=production python backfillPayloads.py [--batch 200] [--dry-run]
+"""
+
+import argparse
+import os
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func
+from app import create_app
+from app.extensions import db
+from app.models.student import Student
+from app.utils.blobStore import blob_store
+from app.utils.hcrCache import normalize_registry_number
+
+REGISTRY_PATTERN = re.compile(r'"registryNumber"\s*:\s*"([^"]*)"')
+
+
+def backfill(batch_size, dry_run):
+    last_id = 0
+    moved = 0
+    freed = 0
+
+    while True:
+        rows = (
+            Student.query
+            .filter(Student.id > last_id)
+            .filter(Student.sourceRef.is_(None))
+            .filter(func.length(Student.payload) > 0)
+            .order_by(Student.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        for student in rows:
+            data = student.payload.encode("utf-8")
+            freed += len(data)
+            moved += 1
+            if not dry_run:
+                # Keep the registry number queryable once payload is emptied.
+                if not student.registryNumber:
+                    found = REGISTRY_PATTERN.search(student.payload)
+                    if found:
+                        student.registryNumber = normalize_registry_number(found.group(1)) or None
+                student.sourceRef = blob_store.put(data)
+                student.payload = ""
+            last_id = student.id
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        db.session.expunge_all()
+        print(f" - processed up to id={last_id} ({moved} rows, {freed // (1024 * 1024)} MB)")
+
+    action = "Would move" if dry_run else "Moved"
+    print(f"✅ {action} {moved} payloads ({freed // (1024 * 1024)} MB) to {blob_store.directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move legacy student payloads into the blob store")
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        backfill(args.batch, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: placeholder replacement in DOCX templates.
+
+Compares the previous per-key replacement (one `_replace_across_runs` pass
+per key, O(runs x chars) per pass) against the single-pass matcher in
+app/utils/injectData.py, on the real templates in TEMPLATE_PATH with a
+replacement dict shaped like the one built by /generateFiles (~60 keys).
+Without TEMPLATE_PATH a synthetic document with split runs is used.
+
+Usage:
+    TEMPLATE_PATH=/path/to/templates python benchTemplates.py [--iterations 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from docx import Document
+from app.utils.injectData import (
+    TEMPLATE_PATH,
+    templateArray,
+    cnaTemplateArray,
+    _get_matcher,
+    _replace_in_paragraph,
+)
+
+
+# -----------------------------
+# Previous implementation, kept here for comparison only
+# -----------------------------
+
+def legacy_replace_across_runs(runs, key, value):
+    if not runs:
+        return
+    full = []
+    idx_map = []
+    for ri, r in enumerate(runs):
+        t = r.text or ""
+        full.append(t)
+        idx_map.extend([(ri, cj) for cj in range(len(t))])
+    s = "".join(full)
+    if not s or key not in s:
+        return
+    new_s = s.replace(key, value)
+    for r in runs:
+        r.text = ""
+    lens = []
+    for ri, r in enumerate(runs):
+        lens.append(sum(1 for pair in idx_map if pair[0] == ri))
+    pos = 0
+    for ri, r in enumerate(runs):
+        take = lens[ri]
+        if take == 0:
+            continue
+        chunk = new_s[pos:pos + take]
+        r.text = chunk
+        pos += len(chunk)
+        if pos >= len(new_s):
+            break
+    if pos < len(new_s):
+        runs[-1].text += new_s[pos:]
+
+
+def legacy_replace_in_paragraph(paragraph, replacements):
+    for run in paragraph.runs:
+        if not run.text:
+            continue
+        for k, v in replacements.items():
+            if k in run.text:
+                run.text = run.text.replace(k, v)
+    for k, v in replacements.items():
+        legacy_replace_across_runs(paragraph.runs, k, v)
+
+
+# -----------------------------
+# Inputs
+# -----------------------------
+
+def sample_replacements():
+    r = {
+        "@firstName": "Maria", "@middleName": "L", "@lastName": "Gonzalez",
+        "@dob": "01/02/1980", "@phone": "(718) 555-0100",
+        "@address": "1 Main St, Bronx, NY, 10472", "@shortAd": "1 Main St",
+        "@city": "Bronx", "@state": "NY", "@zip": "10472", "@ssn": "000-00-0000",
+        "@id": "D193 681 930", "@program": "HHA", "@course": "HHA Spanish AM",
+        "@startDate": "01/06/2025", "@endDate": "02/14/2025",
+        "@graduationDate": "02/14/2025", "@expectedGraduationDate": "02/14/2025",
+        "@teacher": "N/A", "@total": "700", "@registration": "50", "@tuition": "600",
+        "@hours": "75", "@finalSsn": "0000", "@finalHours": "75",
+        "@certiDate": "02/20/2025", "@email": "maria@example.com", "@days": "Mon-Fri",
+        "@sessionType": "AM", "@midpoint": "01/24/2025",
+        "@unig": "02/14/2025", "@fscore": "A", "@fgrade": "A", "@gpa": "4.0", "@sapGpa": "4.0",
+    }
+    for i in range(12):
+        r[("@mg" if i < 9 else "@mge") + str(i + 1)] = "A"
+        r[("@md" if i < 9 else "@mde") + str(i + 1)] = "01/10/2025"
+    for i in range(8):
+        r["@ug" + str(i + 1)] = "A+"
+        r["@ud" + str(i + 1)] = "01/20/2025"
+    return r
+
+
+def synthetic_template(replacements):
+    doc = Document()
+    keys = list(replacements)
+    for i in range(120):
+        p = doc.add_paragraph("Line %d " % i)
+        key = keys[i % len(keys)]
+        # Split the placeholder across runs the way Word often does.
+        p.add_run(key[:3])
+        p.add_run(key[3:])
+        p.add_run(" trailing text")
+    table = doc.add_table(rows=20, cols=4)
+    for ri, row in enumerate(table.rows):
+        for ci, cell in enumerate(row.cells):
+            cell.text = "%s / %s" % (keys[(ri * 4 + ci) % len(keys)], keys[(ri + ci) % len(keys)])
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def load_templates(replacements):
+    if TEMPLATE_PATH:
+        out = []
+        for name in templateArray + cnaTemplateArray:
+            path = os.path.join(TEMPLATE_PATH, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    out.append((name, f.read()))
+        if out:
+            return out
+    return [("synthetic", synthetic_template(replacements))]
+
+
+def all_paragraphs(doc):
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+    return [Paragraph(p, doc._body) for p in doc.element.body.iter(qn("w:p"))]
+
+
+def time_replace(data, replace, replacements, iterations):
+    best = None
+    text = None
+    for _ in range(iterations):
+        doc = Document(BytesIO(data))
+        paragraphs = all_paragraphs(doc)
+        start = time.perf_counter()
+        for p in paragraphs:
+            replace(p, replacements)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        text = "\n".join(p.text for p in paragraphs)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOCX placeholder replacement")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    replacements = sample_replacements()
+    matcher = _get_matcher(replacements)
+
+    print(f"{'template':40} {'legacy ms':>10} {'single-pass ms':>15} {'speedup':>8}")
+    for name, data in load_templates(replacements):
+        legacy, legacy_text = time_replace(data, legacy_replace_in_paragraph, replacements, args.iterations)
+        fast, fast_text = time_replace(
+            data, lambda p, r: _replace_in_paragraph(p, r, matcher), replacements, args.iterations
+        )
+        same = "" if legacy_text == fast_text else "  (output differs)"
+        print(f"{name:40} {legacy * 1000:10.2f} {fast * 1000:15.2f} {legacy / fast if fast else 0:7.1f}x{same}")
+
+
+if __name__ == "__main__":
+    main()
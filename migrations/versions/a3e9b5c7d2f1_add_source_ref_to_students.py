@@ -0,0 +1,28 @@
+"""add source ref to students
+
+Revision ID: a3e9b5c7d2f1
+Revises: f2c6d9a4b1e7
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e9b5c7d2f1'
+down_revision = 'f2c6d9a4b1e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sourceRef', sa.String(length=80), nullable=True))
+        batch_op.create_index(batch_op.f('ix_students_sourceRef'), ['sourceRef'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_students_sourceRef'))
+        batch_op.drop_column('sourceRef')
@@ -0,0 +1,46 @@
+"""add matching runs and updated_at
+
+Revision ID: a7c4e2b9d5f3
+Revises: f3d8a6b1c9e2
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c4e2b9d5f3'
+down_revision = 'f3d8a6b1c9e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'matching_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('mode', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('max_student_id', sa.Integer(), nullable=True),
+        sa.Column('max_scrap_id', sa.Integer(), nullable=True),
+        sa.Column('stats', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Existing rows get NULL and are picked up by their id on the first
+    # incremental run after a full one.
+    for table in ('students', 'scrap'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+    op.create_index('ix_referral_student_id', 'referral', ['student_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_referral_student_id', table_name='referral')
+    for table in ('scrap', 'students'):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
+    op.drop_table('matching_runs')
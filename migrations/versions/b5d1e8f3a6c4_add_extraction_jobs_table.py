@@ -0,0 +1,41 @@
+"""add extraction jobs table
+
+Revision ID: b5d1e8f3a6c4
+Revises: a3e9b5c7d2f1
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d1e8f3a6c4'
+down_revision = 'a3e9b5c7d2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'extraction_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=30), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('progress', sa.String(length=100), nullable=True),
+        sa.Column('filename', sa.String(length=200), nullable=False),
+        sa.Column('classId', sa.Integer(), nullable=True),
+        sa.Column('sourceRef', sa.String(length=80), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_extraction_jobs_status', 'extraction_jobs', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_extraction_jobs_status', table_name='extraction_jobs')
+    op.drop_table('extraction_jobs')
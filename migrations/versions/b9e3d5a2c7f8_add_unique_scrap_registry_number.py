@@ -0,0 +1,41 @@
+"""add unique scrap registry number
+
+Revision ID: b9e3d5a2c7f8
+Revises: a7c4e2b9d5f3
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e3d5a2c7f8'
+down_revision = 'a7c4e2b9d5f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Scraps are referenced by id from referrals, so duplicates are reported
+    # for a manual merge instead of being deleted here.
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT "registryNumber", array_agg(id ORDER BY id) FROM scrap '
+        'WHERE "registryNumber" IS NOT NULL AND "registryNumber" <> \'\' '
+        'GROUP BY "registryNumber" HAVING count(*) > 1 LIMIT 20'
+    )).fetchall()
+    if duplicates:
+        listed = ", ".join(f"{number}: {ids}" for number, ids in duplicates)
+        raise RuntimeError(f"Duplicate scrap registry numbers, merge them first: {listed}")
+
+    op.create_index(
+        'ux_scrap_registry_number',
+        'scrap',
+        ['registryNumber'],
+        unique=True,
+        postgresql_where=sa.text('"registryNumber" IS NOT NULL AND "registryNumber" <> \'\''),
+    )
+
+
+def downgrade():
+    op.drop_index('ux_scrap_registry_number', table_name='scrap')
@@ -0,0 +1,43 @@
+"""add student registry number
+
+Revision ID: c4e7a1d9f2b6
+Revises: b9e3d5a2c7f8
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a1d9f2b6'
+down_revision = 'b9e3d5a2c7f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('registryNumber', sa.String(length=40), nullable=True))
+
+    # Rows that still hold the extractor JSON in payload; normalized the same
+    # way as normalize_registry_number (spaces and dashes removed).
+    op.execute(
+        """
+        UPDATE students
+        SET "registryNumber" = NULLIF(
+            regexp_replace(substring(payload from '"registryNumber"\\s*:\\s*"([^"]*)"'), '[\\s\\-]', '', 'g'),
+            ''
+        )
+        WHERE payload LIKE '%"registryNumber"%'
+        """
+    )
+
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_students_registryNumber'), ['registryNumber'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_students_registryNumber'))
+        batch_op.drop_column('registryNumber')
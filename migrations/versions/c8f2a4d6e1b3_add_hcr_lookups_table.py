@@ -0,0 +1,31 @@
+"""add hcr lookups table
+
+Revision ID: c8f2a4d6e1b3
+Revises: b5d1e8f3a6c4
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f2a4d6e1b3'
+down_revision = 'b5d1e8f3a6c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'hcr_lookups',
+        sa.Column('registry_number', sa.String(length=100), nullable=False),
+        sa.Column('employment', sa.JSON(), nullable=False),
+        sa.Column('found', sa.Boolean(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('registry_number')
+    )
+
+
+def downgrade():
+    op.drop_table('hcr_lookups')
@@ -0,0 +1,30 @@
+"""add updated_at to referral, classes and caregivers
+
+Revision ID: d1f5b3e7a9c2
+Revises: c4e7a1d9f2b6
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f5b3e7a9c2'
+down_revision = 'c4e7a1d9f2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lets `migrating.py --sync` pick up edited rows, not only new ids.
+    # Existing rows get NULL; they were already copied by id.
+    for table in ('referral', 'classes', 'caregivers'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('caregivers', 'classes', 'referral'):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
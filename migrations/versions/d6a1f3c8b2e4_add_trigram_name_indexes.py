@@ -0,0 +1,41 @@
+"""add trigram name indexes
+
+Revision ID: d6a1f3c8b2e4
+Revises: c8f2a4d6e1b3
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6a1f3c8b2e4'
+down_revision = 'c8f2a4d6e1b3'
+branch_labels = None
+depends_on = None
+
+
+# (index, table, indexed expression)
+TRGM_INDEXES = [
+    ('ix_students_first_name_trgm', 'students', '"firstName"'),
+    ('ix_students_middle_name_trgm', 'students', '"middleName"'),
+    ('ix_students_last_name_trgm', 'students', '"lastName"'),
+    ('ix_students_full_name_trgm', 'students', '("firstName" || \' \' || "middleName" || \' \' || "lastName")'),
+    ('ix_scrap_full_name_trgm', 'scrap', '"fullName"'),
+    ('ix_caregivers_full_name_trgm', 'caregivers', 'full_name'),
+    ('ix_referral_full_name_trgm', 'referral', '"fullName"'),
+    ('ix_referral_student_full_name_trgm', 'referral', 'student_full_name'),
+    ('ix_referral_scrap_full_name_trgm', 'referral', 'scrap_full_name'),
+    ('ix_referral_city_trgm', 'referral', 'city'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expr in TRGM_INDEXES:
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expr} gin_trgm_ops)')
+
+
+def downgrade():
+    for name, _, _ in TRGM_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
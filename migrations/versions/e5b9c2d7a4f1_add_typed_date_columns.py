@@ -0,0 +1,88 @@
+"""add typed date columns
+
+Revision ID: e5b9c2d7a4f1
+Revises: d6a1f3c8b2e4
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c2d7a4f1'
+down_revision = 'd6a1f3c8b2e4'
+branch_labels = None
+depends_on = None
+
+
+# Parses the string date formats found in the data (MM/DD/YYYY, MM/DD/YY,
+# MM-DD-YYYY, YYYY-MM-DD with an optional time part) and returns NULL for
+# anything else instead of raising, so one malformed row never breaks a query.
+# Declared IMMUTABLE so it can back generated columns; it only depends on its
+# input because every branch uses an explicit format.
+PARSE_LOOSE_DATE = r"""
+CREATE OR REPLACE FUNCTION parse_loose_date(value text) RETURNS date AS $$
+BEGIN
+    value := btrim(value);
+    IF value IS NULL OR value = '' THEN
+        RETURN NULL;
+    ELSIF value ~ '^\d{1,2}/\d{1,2}/\d{4}$' THEN
+        RETURN to_date(value, 'MM/DD/YYYY');
+    ELSIF value ~ '^\d{1,2}/\d{1,2}/\d{2}$' THEN
+        RETURN to_date(value, 'MM/DD/YY');
+    ELSIF value ~ '^\d{1,2}-\d{1,2}-\d{4}$' THEN
+        RETURN to_date(value, 'MM-DD-YYYY');
+    ELSIF value ~ '^\d{4}-\d{1,2}-\d{1,2}' THEN
+        RETURN to_date(substring(value from '^\d{4}-\d{1,2}-\d{1,2}'), 'YYYY-MM-DD');
+    END IF;
+    RETURN NULL;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+# (table, typed column, source string column, indexed)
+DATE_COLUMNS = [
+    ('referral', 'dobOn', 'dob', True),
+    ('referral', 'graduationDate1On', 'graduationDate1', True),
+    ('referral', 'graduationDate2On', 'graduationDate2', True),
+    ('scrap', 'dobOn', 'dob', True),
+    ('scrap', 'startDateOn', 'startDate', False),
+    ('scrap', 'certifiedDateOn', 'certifiedDate', False),
+    ('scrap', 'certifiedDate2On', 'certifiedDate2', False),
+    ('students', 'dobOn', 'dob', True),
+    ('students', 'graduationDateOn', 'graduationDate', True),
+    ('students', 'certiDateOn', 'certiDate', False),
+    ('classes', 'startDateOn', 'startDate', True),
+    ('classes', 'endDateOn', 'endDate', False),
+    ('classes', 'graduationDateOn', 'graduationDate', True),
+    ('classes', 'certiDateOn', 'certiDate', False),
+    ('classes', 'midpointOn', 'midpoint', False),
+]
+
+
+def _index_name(table, column):
+    return f'ix_{table}_{column}'
+
+
+def upgrade():
+    op.execute(PARSE_LOOSE_DATE)
+    # Stored generated columns are filled for existing rows by the ALTER and
+    # kept in sync by Postgres on every write, bulk paths included.
+    for table, column, source, indexed in DATE_COLUMNS:
+        op.add_column(
+            table,
+            sa.Column(column, sa.Date(), sa.Computed(f'parse_loose_date("{source}")', persisted=True), nullable=True),
+        )
+        if indexed:
+            op.create_index(_index_name(table, column), table, [column], unique=False)
+
+
+def downgrade():
+    for table, column, _, indexed in reversed(DATE_COLUMNS):
+        if indexed:
+            op.drop_index(_index_name(table, column), table_name=table)
+        op.drop_column(table, column)
+    op.execute('DROP FUNCTION IF EXISTS parse_loose_date(text)')
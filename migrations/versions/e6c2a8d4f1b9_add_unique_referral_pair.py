@@ -0,0 +1,42 @@
+"""add unique referral pair
+
+Revision ID: e6c2a8d4f1b9
+Revises: d1f5b3e7a9c2
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6c2a8d4f1b9'
+down_revision = 'd1f5b3e7a9c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Overlapping matcher runs could insert the same pair twice. Keep the copy
+    # a reviewer worked on (else the oldest) and drop the rest.
+    op.execute(
+        """
+        DELETE FROM referral r
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY student_id, scrap_id
+                ORDER BY (decision_status IS NULL OR decision_status = 'PENDING'), id
+            ) AS n
+            FROM referral
+            WHERE student_id IS NOT NULL AND scrap_id IS NOT NULL
+        ) d
+        WHERE r.id = d.id AND d.n > 1
+        """
+    )
+    op.create_index('ux_referral_student_scrap', 'referral', ['student_id', 'scrap_id'], unique=True)
+    op.create_index('ix_referral_scrap_id', 'referral', ['scrap_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_referral_scrap_id', table_name='referral')
+    op.drop_index('ux_referral_student_scrap', table_name='referral')
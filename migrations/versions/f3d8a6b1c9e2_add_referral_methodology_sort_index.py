@@ -0,0 +1,36 @@
+"""add referral methodology sort index
+
+Revision ID: f3d8a6b1c9e2
+Revises: e5b9c2d7a4f1
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3d8a6b1c9e2'
+down_revision = 'e5b9c2d7a4f1'
+branch_labels = None
+depends_on = None
+
+
+# Must match the ORDER BY of list_referrals for each methodologyOrder.
+METHODOLOGY = "(coalesce(methodology1, methodology2, ''))"
+CREATED_AT = "(coalesce(created_at, '1970-01-01'::timestamp))"
+
+
+def upgrade():
+    op.execute(
+        f'CREATE INDEX IF NOT EXISTS ix_referral_methodology_sort '
+        f'ON referral ({METHODOLOGY}, {CREATED_AT} DESC, id DESC)'
+    )
+    op.execute(
+        f'CREATE INDEX IF NOT EXISTS ix_referral_methodology_sort_desc '
+        f'ON referral ({METHODOLOGY} DESC, {CREATED_AT} DESC, id DESC)'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_referral_methodology_sort_desc')
+    op.execute('DROP INDEX IF EXISTS ix_referral_methodology_sort')
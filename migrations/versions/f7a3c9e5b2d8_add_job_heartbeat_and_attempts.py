@@ -0,0 +1,28 @@
+"""add job heartbeat and attempts
+
+Revision ID: f7a3c9e5b2d8
+Revises: e6c2a8d4f1b9
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a3c9e5b2d8'
+down_revision = 'e6c2a8d4f1b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('extraction_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('extraction_jobs', schema=None) as batch_op:
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('heartbeat_at')
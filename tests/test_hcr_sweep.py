@@ -0,0 +1,98 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("bs4")
+
+from app.utils import hcrSweep, scrapper
+
+
+class FakeBrowser:
+    """Stands in for RegistryBrowser; numbers starting with "x" fail and
+    every close raises, like a Chromium that already died."""
+
+    closes = 0
+
+    def __init__(self, headless=True):
+        pass
+
+    def lookup(self, registry_number):
+        if registry_number.startswith("x"):
+            raise RuntimeError("page crashed")
+        return [{"agency": f"AGENCY {registry_number}", "startDate": ""}]
+
+    def close(self):
+        FakeBrowser.closes += 1
+        raise RuntimeError("browser already gone")
+
+
+def test_sweep_finishes_when_browser_close_raises(monkeypatch):
+    monkeypatch.setattr(hcrSweep, "RegistryBrowser", FakeBrowser)
+    batches = []
+    items = [(1, "1111111"), (2, "x222222"), (3, "3333333"), (4, "x444444")]
+
+    hcrSweep.sweep_registry_numbers(items, batches.append, concurrency=2, rate=0, batch_size=3)
+
+    results = {key: (info, error) for batch in batches for key, _, info, error in batch}
+    assert sorted(results) == [1, 2, 3, 4]
+    assert results[1][0] == [{"agency": "AGENCY 1111111", "startDate": ""}]
+    assert isinstance(results[2][1], RuntimeError)
+    assert FakeBrowser.closes >= 4
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launched = []
+
+    def launch(self, headless=True):
+        browser = types.SimpleNamespace(
+            closed=False,
+            new_context=lambda: types.SimpleNamespace(new_page=lambda: types.SimpleNamespace(
+                set_default_timeout=lambda ms: None), close=lambda: None),
+        )
+        browser.close = lambda: setattr(browser, "closed", True)
+        self.launched.append(browser)
+        return browser
+
+
+def test_registry_browser_relaunches_after_close(monkeypatch):
+    chromium = FakeChromium()
+    started = []
+
+    def sync_playwright():
+        pw = types.SimpleNamespace(chromium=chromium, stop=lambda: None)
+        return types.SimpleNamespace(start=lambda: started.append(pw) or pw)
+
+    module = types.ModuleType("playwright.sync_api")
+    module.sync_playwright = sync_playwright
+    monkeypatch.setitem(sys.modules, "playwright", types.ModuleType("playwright"))
+    monkeypatch.setitem(sys.modules, "playwright.sync_api", module)
+    monkeypatch.setattr(scrapper, "HCR_LOOKUP_BACKEND", "browser")
+    monkeypatch.setattr(scrapper, "_lookup_on_page", lambda page, number: [number])
+
+    browser = scrapper.RegistryBrowser()
+    assert chromium.launched == []
+    assert browser.lookup("1234567") == ["1234567"]
+
+    browser.close()
+    assert chromium.launched[0].closed
+    assert browser.lookup("7654321") == ["7654321"]
+    assert len(chromium.launched) == 2 and len(started) == 2
+    browser.close()
+
+
+def test_registry_browser_close_forgets_handles_when_close_fails():
+    browser = scrapper.RegistryBrowser()
+    stopped = []
+
+    def fail():
+        raise RuntimeError("browser already gone")
+
+    browser._browser = types.SimpleNamespace(close=fail)
+    browser._playwright = types.SimpleNamespace(stop=lambda: stopped.append(True))
+
+    with pytest.raises(RuntimeError):
+        browser.close()
+    assert browser._browser is None and browser._playwright is None
+    assert stopped == [True]
@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+from app.utils import matching
+from app.utils.matching import Record, find_matches, name_similarity, normalize_name_tokens, score_pair
+
+DOB = date(1990, 5, 17)
+
+
+def record(id, name, dob=None, registry=None):
+    return Record(id, normalize_name_tokens(name), dob, registry, None)
+
+
+def test_normalize_name_tokens_drops_accents_initials_and_punctuation():
+    assert normalize_name_tokens("José  A.", "de la Cruz-Pérez") == ["cruz", "de", "jose", "la", "perez"]
+    assert normalize_name_tokens("SMITH, JOHN", None, "") == ["john", "smith"]
+    assert normalize_name_tokens("J.", "") == []
+
+
+def test_name_similarity_ignores_order_and_missing_middle_name():
+    assert name_similarity(["jose", "cruz"], ["cruz", "jose"]) == 1.0
+    assert name_similarity(["cruz", "jose", "maria"], ["cruz", "jose"]) == 1.0
+    assert name_similarity(["jose", "smith"], ["jose", "smyth"]) == pytest.approx(0.9)
+    assert name_similarity(["anna", "lee"], ["bob", "kim"]) < 0.5
+    assert name_similarity([], ["anna"]) == 0.0
+
+
+def test_block_keys_cover_registry_dob_and_name_pairs():
+    keys = set(matching._block_keys(record(1, "Ana Maria Cruz", DOB, "1234567")))
+    assert keys == {
+        ("rn", "1234567"), ("dob", DOB),
+        ("nm", "ana", "cruz"), ("nm", "ana", "maria"), ("nm", "cruz", "maria"),
+    }
+    assert set(matching._block_keys(record(2, "Cher"))) == {("nm", "cher")}
+
+
+def test_score_registry_match_wins_over_different_dob():
+    student = record(1, "Ana Cruz", DOB, "1234567")
+    scrap = record(2, "Anna Cruz", date(1991, 1, 1), "1234567")
+    match_type, confidence = score_pair(student, scrap)
+    assert match_type == "REGISTRY"
+    assert 0.8 < confidence <= 1.0
+
+
+def test_score_name_and_dob():
+    assert score_pair(record(1, "Ana Cruz", DOB), record(2, "Cruz Ana", DOB)) == ("NAME_DOB", 1.0)
+
+
+def test_score_rejects_different_dob():
+    assert score_pair(record(1, "Ana Cruz", DOB), record(2, "Ana Cruz", date(1990, 5, 18))) is None
+
+
+def test_score_name_only_is_capped_below_dob_match():
+    assert score_pair(record(1, "Ana Cruz"), record(2, "Ana Cruz", DOB)) == ("NAME", 0.85)
+    assert score_pair(record(1, "Ana Cruz"), record(2, "Bob Kim")) is None
+
+
+def test_oversized_name_block_is_skipped(monkeypatch):
+    monkeypatch.setattr(matching, "MATCH_MAX_BLOCK_SIZE", 2)
+    students = [record(1, "Ana Cruz")]
+    scraps = [record(10 + i, "Ana Cruz") for i in range(3)]
+    matches, compared = find_matches(students, scraps)
+    assert matches == {} and compared == 0
+
+    # A registry block is never skipped.
+    students = [record(1, "Ana Cruz", registry="1234567")]
+    scraps = [record(10 + i, "Ana Cruz", registry="1234567") for i in range(3)]
+    matches, compared = find_matches(students, scraps)
+    assert compared == 3
+    assert {key for key in matches} == {(1, 10), (1, 11), (1, 12)}
+
+
+def test_find_matches_only_scores_changed_records():
+    students = [record(1, "Ana Cruz", DOB), record(2, "Bob Kim", DOB)]
+    scraps = [record(10, "Ana Cruz", DOB), record(11, "Bob Kim", DOB)]
+    matches, _ = find_matches(students, scraps, changed_students=[], changed_scraps=[1])
+    assert set(matches) == {(2, 11)}
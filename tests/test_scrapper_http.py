@@ -0,0 +1,144 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import pytest
+
+pytest.importorskip("bs4")
+
+from app.utils import scrapper
+
+FIXTURES = Path(__file__).parent / "fixtures" / "hcr"
+
+EXPECTED_EMPLOYMENT = [
+    {"agency": "BEST HOME CARE LLC", "startDate": "03/14/2022"},
+    {"agency": "SUNRISE AGENCY INC", "startDate": "01/02/2019"},
+]
+
+
+def fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+class RegistryStub(BaseHTTPRequestHandler):
+    """Serves the saved registry pages. The registry number posted to the
+    search decides which path the rest of the flow takes:
+    1234567 found, 0000000 no match, 2222222 profile without employment,
+    9999999 challenge page at the results URL, 8888888 redirect away."""
+
+    searched = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location):
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path.startswith("/home.action"):
+            self._send(fixture("home.html"))
+        elif self.path.startswith("/blocked"):
+            self._send(fixture("challenge.html"))
+        else:
+            self._send("not found", status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+
+        if self.path.startswith("/searchworker.action"):
+            assert form.get("token") == "abc123"
+            assert "action:searchNumber" in form
+            number = form.get("registryNumber")
+            RegistryStub.searched = number
+            if number == "0000000":
+                self._send(fixture("results_none.html"))
+            elif number == "9999999":
+                self._send(fixture("challenge.html"))
+            elif number == "8888888":
+                self._redirect("/blocked")
+            else:
+                self._send(fixture("results.html"))
+        elif self.path.startswith("/worker.action"):
+            if "action:employment" in form:
+                self._send(fixture("employment.html"))
+            elif RegistryStub.searched == "2222222":
+                self._send(fixture("profile_no_employment.html"))
+            else:
+                assert form.get("resinums[0]") == "1234567"
+                self._send(fixture("profile.html"))
+        else:
+            self._send("not found", status=404)
+
+
+@pytest.fixture
+def home_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RegistryStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/home.action"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_parse_employment_fixture():
+    assert scrapper._parse_all_employment_history(fixture("employment.html")) == EXPECTED_EMPLOYMENT
+
+
+def test_http_lookup_follows_search_profile_employment(home_url):
+    assert scrapper.lookup_current_employment_http("1234567", home_url) == EXPECTED_EMPLOYMENT
+
+
+def test_http_lookup_no_match_page_returns_empty(home_url):
+    assert scrapper.lookup_current_employment_http("0000000", home_url) == []
+
+
+def test_http_lookup_unrecognized_results_page_raises(home_url):
+    with pytest.raises(scrapper.RegistryHttpError):
+        scrapper.lookup_current_employment_http("9999999", home_url)
+
+
+def test_http_lookup_redirect_off_the_flow_raises(home_url):
+    with pytest.raises(scrapper.RegistryHttpError):
+        scrapper.lookup_current_employment_http("8888888", home_url)
+
+
+def test_http_lookup_profile_without_employment_button_raises(home_url):
+    with pytest.raises(scrapper.RegistryHttpError):
+        scrapper.lookup_current_employment_http("2222222", home_url)
+
+
+def test_lookup_falls_back_to_browser_when_http_flow_fails(home_url, monkeypatch):
+    calls = []
+    monkeypatch.setattr(scrapper, "HOME_URL", home_url)
+    monkeypatch.setattr(scrapper, "HCR_LOOKUP_BACKEND", "http")
+    monkeypatch.setattr(
+        scrapper, "lookup_current_employment_browser",
+        lambda number, headless=True: calls.append(number) or ["from browser"],
+    )
+
+    assert scrapper.lookup_current_employment("9999999") == ["from browser"]
+    assert scrapper.lookup_current_employment("1234567") == EXPECTED_EMPLOYMENT
+    assert calls == ["9999999"]
+
+
+def test_http_lookup_connection_error_raises_registry_error():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RegistryStub)
+    port = server.server_address[1]
+    server.server_close()
+    with pytest.raises(scrapper.RegistryHttpError):
+        scrapper.lookup_current_employment_http("1234567", f"http://127.0.0.1:{port}/home.action")